@@ -1,59 +1,169 @@
 
+import logging
+import time
+from urllib.parse import urlsplit
+
 from connect.client import R
 import requests
 
-
-def request_assets_with_env(client, input_data) -> list:
+from reports import instrumentation
+from reports import paging
+from reports import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Fields of the documents that may be left out of a response with select(-field)
+ASSET_FIELDS = (
+    'status', 'events', 'external_id', 'external_uid', 'external_name', 'product', 'connection',
+    'contract', 'marketplace', 'params', 'tiers', 'items', 'configuration', 'billing', 'template',
+)
+REQUEST_FIELDS = (
+    'type', 'status', 'created', 'updated', 'effective_date', 'assignee', 'marketplace', 'contract',
+    'activation_key', 'note', 'reason', 'template', 'params', 'answered',
+) + tuple('asset.' + field for field in ASSET_FIELDS)
+
+
+def get_projection(fields, available_fields) -> list:
+    """
+    Builds the RQL select to leave out of the response every available field that is not
+    needed, a field is needed if it is in fields, contains or is contained by one of them
+
+    :param fields: fields read from the documents, dotted for nested ones, e.g. asset.params
+    :param available_fields: fields that can be left out
+    :return: list with select(...) arguments
+    """
+    return [
+        '-' + available for available in available_fields
+        if not any(
+            field == available
+            or field.startswith(available + '.')
+            or available.startswith(field + '.')
+            for field in fields
+        )
+    ]
+
+
+def _select(resource_set, fields, available_fields):
+    if not fields:
+        return resource_set
+    projection = get_projection(fields, available_fields)
+    return resource_set.select(*projection) if projection else resource_set
+
+
+@instrumentation.instrumented
+def request_assets_with_env(
+        client, input_data, fields=None, exclude_before=False, ordering=(),
+) -> list:
+    assets = client('subscriptions').assets.filter(_get_assets_query(input_data, exclude_before))
+    assets = _select(assets, fields, ASSET_FIELDS)
+    if ordering:
+        assets = assets.order_by(*ordering)
+    return assets.all()
+
+
+@instrumentation.instrumented
+def page_assets_with_env(
+        client, input_data, fields=None, exclude_before=False, ordering=(),
+) -> paging.PagedResourceSet:
+    """
+    Same assets as request_assets_with_env, paged by paging.PagedResourceSet
+    """
+    return paging.PagedResourceSet(
+        client,
+        client('subscriptions').assets.path,
+        _get_assets_query(input_data, exclude_before),
+        get_projection(fields, ASSET_FIELDS) if fields else (),
+        ordering,
+    )
+
+
+def _get_assets_query(input_data, exclude_before=False):
     rql = R().events.created.at.ge(input_data['date']['after'])
-    rql &= R().events.created.at.le(input_data['date']['before'])
+    if exclude_before:
+        rql &= R().events.created.at.lt(input_data['date']['before'])
+    else:
+        rql &= R().events.created.at.le(input_data['date']['before'])
     rql &= R().product.id.oneof(input_data['product']['choices'])
     if input_data.get('connection_type') and input_data['connection_type']['all'] is False:
         rql &= R().connection.type.oneof(input_data['connection_type']['choices'])
     if input_data.get('status') and input_data['status']['all'] is False:
         rql &= R().status.oneof(input_data['status']['choices'])
-    return client('subscriptions').assets.filter(rql).all()
+    return rql
+
 
-def request_assets(client, input_data) -> list:
+@instrumentation.instrumented
+def request_assets(client, input_data, fields=None) -> list:
     rql = R().events.created.at.ge(input_data['date']['after'])
     rql &= R().events.created.at.le(input_data['date']['before'])
     rql &= R().product.id.oneof(input_data['product']['choices'])
     if input_data.get('status') and input_data['status']['all'] is False:
         rql &= R().status.oneof(input_data['status']['choices'])
-    return client('subscriptions').assets.filter(rql).all()
+    return _select(client('subscriptions').assets.filter(rql), fields, ASSET_FIELDS).all()
 
 
+@instrumentation.instrumented
 def request_listing(client, marketplace_id, product_id) -> dict:
     rql = R()
     rql &= R().marketplace.id.eq(marketplace_id)
     rql &= R().product.id.eq(product_id)
     rql &= R().status.eq('listed')
-    return client.listings.filter(rql).first()
+    return response_cache.cached(
+        client, 'listings', 'listings?{}'.format(rql),
+        lambda: client.listings.filter(rql).first(),
+    )
 
 
+@instrumentation.instrumented
 def request_price_list(client, price_list_id) -> dict:
     rql = R()
     rql &= R().pricelist.id.eq(price_list_id)
     rql &= R().status.eq('active')
-    return client('pricing').versions.filter(rql).first()
-
-
-def request_price_list_version_points(client, price_list_version_id) -> list:
+    return response_cache.cached(
+        client, 'price_list_versions', 'pricing/versions?{}'.format(rql),
+        lambda: client('pricing').versions.filter(rql).first(),
+    )
+
+
+@instrumentation.instrumented
+def request_price_list_version_points(client, price_list_version_id):
+    """
+    Returns the filled points of the price list version, as a lazy resource set read page by
+    page, or as a list when the response cache is on
+    """
     rql = R()
     rql &= R().status.eq('filled')
-    return client('pricing').versions[price_list_version_id].points.filter(rql).all()
-
-
-def request_get(url):
-    res = requests.models.Response
+    points = client('pricing').versions[price_list_version_id].points.filter(rql).all()
+    if response_cache.get_cache() is None:
+        return points
+    return response_cache.cached(
+        client,
+        'price_list_points',
+        'pricing/versions/{}/points?{}'.format(price_list_version_id, rql),
+        lambda: list(points),
+    )
+
+
+@instrumentation.instrumented
+def request_get(url, session=None, timeout=None):
+    res = requests.models.Response()
     res.status_code = 0
+    started = time.perf_counter()
     try:
-        res = requests.get(url)
+        res = (session or requests).get(url, timeout=timeout)
     except requests.exceptions.RequestException as e:
-        print(e)
+        logger.warning('GET %s failed: %s', url, e)
+    parts = urlsplit(url)
+    instrumentation.record_call(
+        instrumentation.get_endpoint(parts.netloc + parts.path), time.perf_counter() - started,
+        response=res if res.status_code else None, error=res.status_code != 200,
+    )
     return res
 
 
-def request_approved_requests(client, parameters):
+@instrumentation.instrumented
+def page_approved_requests(
+        client, parameters, fields=None, ordering=('created',),
+) -> paging.PagedResourceSet:
     query = R()
     query &= R().status.eq('approved')
     query &= R().created.ge(parameters['date']['after'])
@@ -67,10 +177,18 @@ def request_approved_requests(client, parameters):
         query &= R().type.oneof(parameters['rr_type']['choices'])
     if parameters.get('mkp') and parameters['mkp']['all'] is False:
         query &= R().marketplace.id.oneof(parameters['mkp']['choices'])
-    return client.requests.filter(query).order_by("created")
+    return paging.PagedResourceSet(
+        client,
+        client.requests.path,
+        query,
+        get_projection(fields, REQUEST_FIELDS) if fields else (),
+        ordering,
+    )
 
 
-def request_asset(client, asset_id):
+@instrumentation.instrumented
+def request_assets_by_ids(client, asset_ids, fields=None) -> list:
     query = R()
-    query &= R().id.eq(asset_id)
-    return client('subscriptions').assets.filter(query).first()
+    query &= R().id.oneof(list(asset_ids))
+    assets = _select(client('subscriptions').assets.filter(query), fields, ASSET_FIELDS)
+    return assets.limit(len(asset_ids)).all()
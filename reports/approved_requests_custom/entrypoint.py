@@ -3,103 +3,190 @@
 # Copyright (c) 2021, Carolina Giménez Escalante
 # All rights reserved.
 #
+from functools import partial
 
 from reports import utils
 from reports import api_calls
+from reports import checkpoint
+from reports import columns
+from reports import incremental
+from reports import instrumentation
+from reports import pipeline
+from reports import row_workers
+from reports import settings
+from reports.pricing import PricingCache
+from reports.run_context import RunContext
+
+# requests read ahead to collect the ids of their subscriptions
+SUBSCRIPTIONS_WINDOW = 500
+# subscription ids per id.oneof(...) query
+SUBSCRIPTIONS_CHUNK = 100
+
+# request fields read to build the rows, the rest are left out of the responses
+request_fields = [
+    'id', 'type', 'created', 'effective_date', 'assignee', 'marketplace', 'asset.id',
+    'asset.external_id', 'asset.status', 'asset.product', 'asset.marketplace', 'asset.connection',
+    'asset.tiers', 'asset.params', 'asset.configuration.params', 'asset.items',
+]
+# subscription fields read from the prefetched subscriptions
+subscription_fields = ['id', 'billing']
+
+# path of the params of the asset of a request
+ASSET_PARAMS = ('asset', 'params')
 
 
 def generate(client, parameters, progress_callback, renderer_type=None, extra_context=None, ):
-    requests = api_calls.request_approved_requests(client, parameters)
-
-    progress = 0
-    total = requests.count()
-    for request in requests:
-        # get subscription parameters values
-        parameters_list = request['asset']['params']
-        vip_number = utils.get_param_value(parameters_list, 'adobe_vip_number')
-        order_number = utils.get_param_value(parameters_list, 'adobe_order_id')
-        transfer_number = utils.get_param_value(parameters_list, 'transfer_id')
-        action = utils.get_param_value(parameters_list, 'action_type')
-        adobe_user_email = utils.get_param_value(parameters_list, 'adobe_user_email')
-        adobe_cloud_program_id = utils.get_param_value(parameters_list, 'adobe_customer_id')
-        pricing_level = utils.get_discount_level(utils.get_param_value(parameters_list, 'discount_group'))
-        commitment = utils.get_param_value(parameters_list, 'commitment_status')
-        commitment_start_date = utils.get_param_value(parameters_list, 'commitment_start_date')
-        commitment_end_date = utils.get_param_value(parameters_list, 'commitment_end_date')
-        recommitment = utils.get_param_value(parameters_list, 'recommitment_status')
-        recommitment_start_date = utils.get_param_value(parameters_list, 'recommitment_start_date')
-        recommitment_end_date = utils.get_param_value(parameters_list, 'recommitment_end_date')
-        external_referenci_id = utils.get_param_value(parameters_list, 'external_reference_id')
-        hvd_code = utils.get_hvd_code(next((d for d in parameters_list if d['id'] == 'cb_price_level_hint_final_object'), {}))
-
-        # get currency from configuration params
-        currency = utils.get_param_value(request['asset']['configuration']['params'], 'Adobe_Currency')
-
-        financials = utils.get_financials_from_product_per_marketplace(
-            client, request['asset']['marketplace']['id'], request['asset']['product']['id'])
-
-        subscription = api_calls.request_asset(client, request['asset']['id'])  # request for anniversary date
-        for item in request['asset']['items']:
-            delta_str = _get_delta_str(item)
-            if delta_str == '':
-                continue
-
-            if "commitment_status" in parameters and parameters['commitment_status'] == '3yc':  # pragma: no cover
-                if commitment == '-' or commitment == '':
-                    continue
-
-            yield (
-                utils.get_basic_value(request, 'id'),  # Request ID
-                utils.get_value(request, 'assignee', 'id'),  # ASSIGNEE
-                utils.get_value(request, 'asset', 'id'),  # Connect Subscription ID
-                utils.get_value(request, 'asset', 'external_id'),  # End Customer Subscription ID
-                action,  # Type of Purchase
-                order_number,  # Adobe Order #
-                transfer_number,  # Adobe Transfer ID #
-                vip_number,  # VIP #
-                adobe_cloud_program_id,  # Adobe Cloud Program ID
-                pricing_level,  # Pricing SKU Level (Volume Discount level)
-                hvd_code,
-                utils.get_basic_value(item, 'display_name'),  # Product Description
-                utils.get_basic_value(item, 'mpn'),  # Part Number
-                utils.get_basic_value(item, 'period'),  # Product Period
-                utils.get_basic_value(item, 'quantity'),  # Cumulative Seat
-                delta_str,  # Order Delta
-                utils.get_value(request['asset']['tiers'], 'tier1', 'id'),  # Reseller ID
-                utils.get_value(request['asset']['tiers'], 'tier1', 'name'),  # Reseller Name
-                utils.get_value(request['asset']['tiers'], 'customer', 'name'),  # End Customer Name
-                utils.get_value(request['asset']['tiers'], 'customer', 'external_id'),  # End Customer External ID
-                utils.get_value(request['asset']['connection'], 'provider', 'id'),  # Provider ID
-                utils.get_value(request['asset']['connection'], 'provider', 'name'),  # Provider Name
-                utils.get_value(request, 'marketplace', 'name'),  # Marketplace
-                utils.get_value(request['asset'], 'product', 'id'),  # Product ID
-                utils.get_value(request['asset'], 'product', 'name'),  # Product Name
-                utils.get_value(request, 'asset', 'status'),  # Subscription Status
-                utils.get_value(subscription, 'billing', 'next_date'),  # Anniversary Date
-                utils.convert_to_datetime(
-                    utils.get_basic_value(request, 'effective_date'),  # Effective  Date
-                ),
-                utils.convert_to_datetime(
-                    utils.get_basic_value(request, 'created'),  # Creation  Date
+    with instrumentation.run('approved_requests_custom', client):
+        store = _open_store(parameters)
+        # the incremental store already resumes from its watermark, a checkpoint is only needed
+        # without it
+        run = None if store else checkpoint.open_checkpoint(
+            'approved_requests_custom', parameters, renderer_type,
+        )
+        query_parameters, context, pricing = parameters, RunContext(), None
+        if run:
+            query_parameters, context, pricing = run.resume(client, parameters)
+            store = run
+        elif store:
+            query_parameters = dict(parameters, date=dict(parameters['date']))
+            query_parameters['date']['after'] = store.start(parameters['date']['after'])
+        try:
+            if store:
+                for row in store.stored_rows(parameters['date']['before']):
+                    yield (
+                        row[:EXPORTED_AT_COLUMN]
+                        + (context.exported_at,)
+                        + row[EXPORTED_AT_COLUMN + 1:]
+                    )
+
+            requests = api_calls.page_approved_requests(
+                client, query_parameters, request_fields, checkpoint.REQUEST_ORDERING,
+            )
+
+            pricing = pricing or PricingCache(client)
+
+            progress = run.recorded() if run else 0
+            total = progress + requests.count()
+            workers = settings.max_workers()
+            # the price tables are sliced to the items of each request before they are pickled
+            sliced = settings.processes() > 1
+            # the requests are filtered on the commitment_status param by id, as in its column
+            commitment_filter = utils.CommitmentFilter.for_parameters(
+                parameters, lambda request: request['asset']['params'], utils.get_param_value,
+            )
+            # only the enrichments the columns read are fetched
+            if columns.SUBSCRIPTION in column_spec.requires:
+                # a window reaching past the next commit of the store would delay its rows
+                window_size = min(SUBSCRIPTIONS_WINDOW, store.commit_every) if store else None
+                requests_and_subscriptions = _with_subscriptions(
+                    client, commitment_filter(requests), workers, window_size,
+                )
+            else:
+                requests_and_subscriptions = (
+                    (request, {}) for request in commitment_filter(requests)
+                )
+            if columns.PRICING not in column_spec.requires:
+                pricing = None
+            enriched_requests = pipeline.ordered_map(
+                lambda request_and_subscription: _add_financials(
+                    pricing, *request_and_subscription, sliced=sliced,
                 ),
-                utils.get_basic_value(request, 'type'),  # Transaction Type
-                adobe_user_email,  # Adobe User Email
-                currency,  # Currency
-                utils.get_value(financials, item['global_id'], 'cost'),  # Cost
-                utils.get_value(financials, item['global_id'], 'reseller_cost'),  # Reseller Cost
-                utils.get_value(financials, item['global_id'], 'msrp'),  # MSRP
-                utils.get_basic_value(request['asset']['connection'], 'type'),  # Connection Type,
-                utils.today_str(),  # Exported At
-                commitment,
-                commitment_start_date,
-                commitment_end_date,
-                recommitment,
-                recommitment_start_date,
-                recommitment_end_date,
-                external_referenci_id,
+                requests_and_subscriptions,
+                workers,
+                settings.max_in_flight(),
             )
-        progress += 1
-        progress_callback(progress, total)
+            rows_per_request = row_workers.rows_per_element(
+                enriched_requests, get_row_builder, (parameters, context),
+            )
+            yield from checkpoint.emit_rows(
+                rows_per_request, store, progress, total, progress_callback, commitment_filter,
+            )
+            if run:
+                run.finish()
+        finally:
+            if store:
+                store.close()
+
+
+def get_row_builder(parameters: dict, context: RunContext):
+    """
+    Returns the function building the rows of a request enriched by _add_financials, one per
+    item with a quantity change
+
+    :param parameters: report parameters
+    :param context: clock of the report run
+    :return: function of the request, its subscription and its price table returning a list of
+             row tuples, see column_spec
+    """
+    rows_of = column_spec.compile(context)
+
+    def build_rows(request: dict, subscription: dict, price_table) -> list:
+        return rows_of(request, pricing=price_table, subscription=subscription)
+
+    return build_rows
+
+
+def _open_store(parameters: dict):
+    """
+    Returns the store of the incremental mode if REPORTS_INCREMENTAL_STORE is set, otherwise None
+    """
+    path = settings.incremental_store()
+    if not path:
+        return None
+    return incremental.WatermarkStore(path, incremental.get_scope(parameters))
+
+
+def _with_subscriptions(client, requests, workers=1, window_size=None):
+    """
+    Reads requests ahead in windows, fetches the subscriptions of each window in chunks of ids
+    and yields every request along with its subscription, which is needed for the anniversary
+    date
+
+    :type client: connect.ConnectClient
+    :type workers: int
+    :param client: connect.ConnectClient
+    :param requests: iterable with approved requests
+    :param workers: threads used to fetch the chunks of a window
+    :param window_size: requests per window, SUBSCRIPTIONS_WINDOW by default
+    :return: generator of (request, subscription) tuples, subscription is {} if not found
+    """
+    for window in utils.chunks(requests, window_size or SUBSCRIPTIONS_WINDOW):
+        asset_ids = list(dict.fromkeys(request['asset']['id'] for request in window))
+        subscriptions = {}
+        fetched_chunks = pipeline.ordered_map(
+            lambda chunk: list(api_calls.request_assets_by_ids(client, chunk, subscription_fields)),
+            utils.chunks(asset_ids, SUBSCRIPTIONS_CHUNK),
+            workers,
+        )
+        for fetched_chunk in fetched_chunks:
+            for subscription in fetched_chunk:
+                subscriptions[subscription['id']] = subscription
+        for request in window:
+            yield request, subscriptions.get(request['asset']['id'], {})
+
+
+def _add_financials(
+        pricing: PricingCache, request: dict, subscription: dict, sliced: bool = False,
+) -> tuple:
+    """
+    Returns the request and its subscription along with the financials of the request items
+
+    :type pricing: reports.pricing.PricingCache
+    :param pricing: run-scoped cache of price lists per marketplace and product, None if the
+                    requests are not priced
+    :param request: approved request
+    :param subscription: subscription of the request
+    :param sliced: whether to return only the financials of the items of the request
+    :return: tuple with request, subscription and the PriceTable of the request, or None
+    """
+    if pricing is None:
+        return request, subscription, None
+    price_table = pricing.get_table(
+        request['asset']['marketplace']['id'], request['asset']['product']['id'],
+    )
+    if sliced and price_table is not None:
+        price_table = price_table.subset(item['global_id'] for item in request['asset']['items'])
+    return request, subscription, price_table
 
 
 def _get_delta_str(item):
@@ -120,3 +207,102 @@ def _get_delta_str(item):
             delta_str = str(delta)
         return delta_str
     return ''
+
+
+def _get_discount_level(param: dict) -> str:
+    return utils.get_discount_level(param.get('value', '-'))
+
+
+def _get_price(name: str, item: dict, price_table) -> str:
+    """
+    :param price_table: reports.price_table.PriceTable with cost, reseller_cost and msrp for
+                        each item[global_id], None if there is no price list
+    """
+    return price_table.get(item['global_id'], name) if price_table else '-'
+
+
+def _get_exported_at(context: RunContext) -> str:
+    return context.exported_at
+
+
+def _get_items(request: dict) -> list:
+    return request['asset']['items']
+
+
+# columns of the rows, the anniversary date comes from the subscription of the request and the
+# cost, reseller cost and msrp from its price list
+column_spec = columns.ColumnSpec([
+    columns.Column('Request ID', columns.path('id')),
+    columns.Column('Assignee', columns.path('assignee', 'id')),
+    columns.Column('Connect Subscription ID', columns.path('asset', 'id')),
+    columns.Column('End Customer Subscription ID', columns.path('asset', 'external_id')),
+    columns.Column('Type of Purchase', columns.param('action_type', ASSET_PARAMS)),
+    columns.Column('Adobe Order #', columns.param('adobe_order_id', ASSET_PARAMS)),
+    columns.Column('Adobe Transfer ID #', columns.param('transfer_id', ASSET_PARAMS)),
+    columns.Column('VIP #', columns.param('adobe_vip_number', ASSET_PARAMS)),
+    columns.Column('Adobe Cloud Program ID', columns.param('adobe_customer_id', ASSET_PARAMS)),
+    columns.Column(
+        'Pricing SKU Level (Volume Discount level)',
+        columns.param('discount_group', ASSET_PARAMS, _get_discount_level),
+    ),
+    columns.Column(
+        'HVD Code',
+        columns.param('cb_price_level_hint_final_object', ASSET_PARAMS, utils.get_hvd_code),
+    ),
+    columns.Column('Product Description', columns.path('display_name', of=columns.ITEM)),
+    columns.Column('Part Number', columns.path('mpn', of=columns.ITEM)),
+    columns.Column('Product Period', columns.path('period', of=columns.ITEM)),
+    columns.Column('Cumulative Seat', columns.path('quantity', of=columns.ITEM)),
+    columns.Column('Order Delta', columns.computed(_get_delta_str, columns.ITEM)),
+    columns.Column('Reseller ID', columns.path('asset', 'tiers', 'tier1', 'id')),
+    columns.Column('Reseller Name', columns.path('asset', 'tiers', 'tier1', 'name')),
+    columns.Column('End Customer Name', columns.path('asset', 'tiers', 'customer', 'name')),
+    columns.Column(
+        'End Customer External ID', columns.path('asset', 'tiers', 'customer', 'external_id'),
+    ),
+    columns.Column('Provider ID', columns.path('asset', 'connection', 'provider', 'id')),
+    columns.Column('Provider Name', columns.path('asset', 'connection', 'provider', 'name')),
+    columns.Column('Marketplace', columns.path('marketplace', 'name')),
+    columns.Column('Product ID', columns.path('asset', 'product', 'id')),
+    columns.Column('Product Name', columns.path('asset', 'product', 'name')),
+    columns.Column('Subscription Status', columns.path('asset', 'status')),
+    columns.Column(
+        'Anniversary Date', columns.path('billing', 'next_date', of=columns.SUBSCRIPTION),
+    ),
+    columns.Column(
+        'Effective Date',
+        columns.computed(utils.convert_to_datetime, columns.path('effective_date')),
+    ),
+    columns.Column(
+        'Creation Date', columns.computed(utils.convert_to_datetime, columns.path('created')),
+    ),
+    columns.Column('Transaction Type', columns.path('type')),
+    columns.Column('Adobe User Email', columns.param('adobe_user_email', ASSET_PARAMS)),
+    columns.Column(
+        'Currency', columns.param('Adobe_Currency', ('asset', 'configuration', 'params')),
+    ),
+    columns.Column(
+        'Cost', columns.computed(partial(_get_price, 'cost'), columns.ITEM, columns.PRICING),
+    ),
+    columns.Column(
+        'Reseller Cost',
+        columns.computed(partial(_get_price, 'reseller_cost'), columns.ITEM, columns.PRICING),
+    ),
+    columns.Column(
+        'MSRP', columns.computed(partial(_get_price, 'msrp'), columns.ITEM, columns.PRICING),
+    ),
+    columns.Column('Connection Type', columns.path('asset', 'connection', 'type')),
+    columns.Column('Exported At', columns.computed(_get_exported_at, columns.CONTEXT)),
+    columns.Column('Commitment Status', columns.param('commitment_status', ASSET_PARAMS)),
+    columns.Column('Commitment Start Date', columns.param('commitment_start_date', ASSET_PARAMS)),
+    columns.Column('Commitment End Date', columns.param('commitment_end_date', ASSET_PARAMS)),
+    columns.Column('Recommitment Status', columns.param('recommitment_status', ASSET_PARAMS)),
+    columns.Column(
+        'Recommitment Start Date', columns.param('recommitment_start_date', ASSET_PARAMS),
+    ),
+    columns.Column('Recommitment End Date', columns.param('recommitment_end_date', ASSET_PARAMS)),
+    columns.Column('External Reference ID', columns.param('external_reference_id', ASSET_PARAMS)),
+], items=_get_items, skip_empty='Order Delta', row_type=tuple)
+
+# position of "Exported At" in the rows, refreshed when stored rows are emitted again
+EXPORTED_AT_COLUMN = column_spec.position('Exported At')
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import hashlib
+import json
+import os
+import pickle
+from datetime import datetime
+
+from reports import export
+from reports import financials
+from reports import forex
+from reports import incremental
+from reports import instrumentation
+from reports import row_workers
+from reports import settings
+from reports import sharding
+from reports import utils
+from reports.pricing import PricingCache
+from reports.run_context import RunContext
+
+# ordering of the assets of a checkpointed run, the one the watermark follows
+ASSET_ORDERING = ('events.created.at', 'id')
+# ordering of the approved requests, the id breaks the ties of the watermark as for the assets
+REQUEST_ORDERING = ('created', 'id')
+
+
+def open_checkpoint(report: str, parameters: dict, renderer_type=None):
+    """
+    Returns the checkpoint of the run if REPORTS_CHECKPOINT is set, otherwise None
+    """
+    path = settings.checkpoint()
+    if not path:
+        return None
+    return Checkpoint(path, report, parameters, renderer_type)
+
+
+def generate_assets(
+        client, report, input_data: dict, progress_callback, renderer_type: str = 'xlsx',
+):
+    """
+    Yields the rows of an asset report, resumed from the checkpoint of the run if
+    REPORTS_CHECKPOINT is set
+
+    :type input_data: dict
+    :type renderer_type: str
+    :param client: An instance of the CloudBlue Connect client.
+    :param report: entrypoint module of an asset report (asset_fields, column_spec, headers and
+                   get_row_builder)
+    :param input_data: report parameters
+    :param progress_callback: function called with the assets processed and the total
+    :param renderer_type: renderer the rows are generated for
+    """
+    name = report.__name__.split('.')[-2]
+    with instrumentation.run(name, client), export.streamed_pages(client):
+        run = open_checkpoint(name, input_data, renderer_type)
+        if run:
+            query_data, context, pricing = run.resume(client, input_data)
+        else:
+            query_data, context, pricing = input_data, RunContext(), PricingCache(client)
+        try:
+            ordering = ASSET_ORDERING if run else ()
+            assets = sharding.request_assets_with_env(
+                client, query_data, report.asset_fields, ordering,
+            )
+            done = run.recorded() if run else 0
+            total = done + assets.count()
+            commitment_filter = utils.CommitmentFilter.for_parameters(input_data, _get_params)
+            rows_per_asset = row_workers.rows_per_element(
+                financials.enriched_assets(
+                    pricing, commitment_filter(assets), report.column_spec.requires,
+                ),
+                report.get_row_builder,
+                (input_data, renderer_type, context),
+            )
+
+            yield from export.leading_rows(report.headers, renderer_type, total)
+            if run:
+                yield from run.stored_rows(input_data['date']['before'])
+            yield from emit_rows(
+                rows_per_asset, run, done, total, progress_callback, commitment_filter,
+                _get_created_at,
+            )
+            if run:
+                run.finish()
+        finally:
+            if run:
+                run.close()
+
+
+def emit_rows(
+        rows_per_element, store, done: int, total: int, progress_callback, commitment_filter,
+        get_created=None,
+):
+    """
+    Yields the rows of each element, but those of the elements the store recorded at its
+    watermark before the run was resumed, records the rest in the store and reports the progress
+    after each element
+
+    :type done: int
+    :type total: int
+    :param rows_per_element: (element, rows) tuples from row_workers.rows_per_element, the
+                             document (asset or request) first in element
+    :param store: Checkpoint or incremental.WatermarkStore of the run, None without
+    :param done: elements processed before the run was resumed
+    :param total: elements of the run
+    :param progress_callback: function called with the elements processed and the total
+    :param commitment_filter: utils.CommitmentFilter the elements went through
+    :param get_created: function returning the creation date of a document, its created field
+                        by default
+    """
+    counter = done
+    for counter, (element, rows) in enumerate(rows_per_element, done + 1):
+        document = element[0]
+        # documents at the watermark may have been emitted before the run was resumed
+        if not store or not store.is_recorded(document['id']):
+            yield from rows
+            if store:
+                store.record(document, rows, get_created(document) if get_created else None)
+        # the documents left out by the filter count as processed
+        progress_callback(counter + commitment_filter.skipped, total)
+    if commitment_filter.skipped:
+        progress_callback(counter + commitment_filter.skipped, total)
+
+
+def _get_params(asset: dict) -> list:
+    return asset['params']
+
+
+def _get_created_at(asset: dict) -> str:
+    return asset['events']['created']['at']
+
+
+def get_run_key(report: str, parameters: dict, renderer_type=None) -> str:
+    """
+    Key of a run: the report, all its parameters and the renderer, only the same run resumes
+    from a checkpoint
+
+    :return: str with a hash of the run
+    """
+    run = {'report': report, 'parameters': parameters, 'renderer_type': renderer_type}
+    return hashlib.sha1(json.dumps(run, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Checkpoint(incremental.WatermarkStore):
+    """
+    Progress of a report run saved to a local file, so that a run failing half way, on a
+    transient API error for instance, can be retried from where it stopped.
+
+    Assets and requests are processed ordered by creation date (and id), so the watermark of the
+    store is the cursor of the query: a retried run replays the rows saved with stored_rows()
+    and queries the rest from the watermark on. Along with the rows, a checkpoint keeps what
+    makes a run give the same rows: the time it started at, the price lists resolved so far,
+    which also spares their lookups, and the forex rates, in a snapshot next to the file.
+    Everything is saved every REPORTS_CHECKPOINT_EVERY assets or requests, and forgotten by
+    finish() once the run has emitted all its rows.
+
+    :type path: str
+    :type report: str
+    :type parameters: dict
+    :param path: path of the sqlite database
+    :param report: name of the report
+    :param parameters: report parameters
+    :param renderer_type: renderer the rows are generated for
+    """
+
+    def __init__(self, path: str, report: str, parameters: dict, renderer_type=None):
+        super().__init__(path, get_run_key(report, parameters, renderer_type))
+        self.commit_every = settings.checkpoint_every()
+        self.rates_path = '{}.{}.rates.json'.format(path, self.scope[:16])
+        self.pricing = None
+        self._saved_entries = 0
+
+    def resume(self, client, parameters: dict) -> tuple:
+        """
+        Starts the run, from scratch or from the checkpoint
+
+        :type parameters: dict
+        :param client: connect.ConnectClient of the run
+        :param parameters: report parameters
+        :return: tuple with the parameters to query from the watermark on, the RunContext and
+                 the PricingCache of the run
+        """
+        query_parameters = dict(parameters, date=dict(parameters['date']))
+        query_parameters['date']['after'] = self.start(parameters['date']['after'])
+
+        now = self._get_meta('now')
+        if now is None:
+            context = RunContext()
+            self._set_meta('now', context.now.isoformat())
+            self.connection.commit()
+        else:
+            context = RunContext(datetime.fromisoformat(now))
+
+        self.pricing = PricingCache(client, forex.ForexRateProvider(snapshot_path=self.rates_path))
+        entries = self._get_meta('pricing')
+        if entries is not None:
+            self.pricing.preload(pickle.loads(entries))
+            self._saved_entries = len(self.pricing.entries())
+        return query_parameters, context, self.pricing
+
+    def finish(self):
+        """
+        Forgets the run, all its rows have been emitted
+        """
+        self._reset()
+        self.connection.commit()
+        self.pricing = None
+        if os.path.exists(self.rates_path):
+            os.remove(self.rates_path)
+
+    def _commit(self):
+        if self.pricing is not None:
+            entries = self.pricing.entries()
+            # price lists are only added to the cache, so a new size means new ones to save
+            if len(entries) != self._saved_entries:
+                self._set_meta('pricing', pickle.dumps(entries))
+                self._saved_entries = len(entries)
+        super()._commit()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Declarative columns of the reports.
+
+A report is declared as a ColumnSpec, the ordered list of its columns. Every column says where
+its value comes from: a path in the asset or request, a param by id or by name, or a handler
+computing it from the inputs it declares. Besides the document, the item of the row and the
+context of the run, the inputs are the enrichments fetched for the document, PRICING and
+SUBSCRIPTION, so a spec knows which of them its columns require and a report only fetches
+those.
+
+    column_spec = ColumnSpec([
+        Column('id', path('id')),
+        Column('VIP #', param('adobe_vip_number', ('asset', 'params'))),
+        Column('Cost', computed(get_cost, ITEM, PRICING)),
+    ], items=get_items)
+
+compile() turns the spec into a row builder once per run: every source becomes an accessor,
+the params of a document are indexed once whatever the number of param columns, and the
+columns that do not read the item are computed once per document and shared by its rows.
+"""
+from collections import namedtuple
+from operator import itemgetter
+
+from reports import utils
+
+# inputs of the sources
+DOCUMENT = 'document'
+ITEM = 'item'
+CONTEXT = 'context'
+PRICING = 'pricing'
+SUBSCRIPTION = 'subscription'
+
+# inputs fetched for the documents, the ones a spec reads are in its requires
+ENRICHMENTS = (PRICING, SUBSCRIPTION)
+
+# path of the params of an asset
+ASSET_PARAMS = ('params',)
+
+# param of the ids not found, never modified
+_NO_PARAM = {}
+
+# column of a report, source is a Source
+Column = namedtuple('Column', ('name', 'source'))
+
+# columns named after the keys of an input dict, see merged
+MergedColumns = namedtuple('MergedColumns', ('names', 'of'))
+
+
+class Source:
+    """
+    Where the value of a column comes from
+
+    :type inputs: tuple
+    :type indexes: dict
+    :param inputs: names of the inputs read
+    :param indexes: functions of the document building the indexes read, by key
+    """
+
+    def __init__(self, inputs: tuple, indexes: dict = None):
+        self.inputs = frozenset(inputs)
+        self.indexes = indexes or {}
+
+    def compile(self):
+        """
+        :return: function of the scope of the row, the dict of its inputs and indexes,
+                 returning the value of the column
+        """
+        raise NotImplementedError
+
+
+class _Path(Source):
+    def __init__(self, keys: tuple, of: str):
+        super().__init__((of,))
+        self.keys = keys
+        self.of = of
+
+    def compile(self):
+        return utils.path_accessor((self.of,) + self.keys)
+
+
+class _Field(Source):
+    def __init__(self, key: str, of: str):
+        super().__init__((of,))
+        self.key = key
+        self.of = of
+
+    def compile(self):
+        of, key = self.of, self.key
+
+        def accessor(scope):
+            values = scope[of]
+            return values.get(key) if values else None
+        return accessor
+
+
+class _Param(Source):
+    def __init__(self, param_id: str, params: tuple, handler):
+        index = ('params by id',) + params
+        super().__init__((DOCUMENT,), {index: _param_index(params, 'by_id')})
+        self.param_id = param_id
+        self.handler = handler
+        self.index = index
+
+    def compile(self):
+        index, param_id, handler = self.index, self.param_id, self.handler
+        if handler is None:
+            return lambda scope: scope[index].get(param_id, _NO_PARAM).get('value', '-')
+        return lambda scope: handler(scope[index].get(param_id, {}))
+
+
+class _NamedParam(Source):
+    def __init__(self, name: str, params: tuple, handler):
+        index = ('params by name',) + params
+        # the last param of a name wins
+        super().__init__((DOCUMENT,), {index: _param_index(params, 'by_name', last=True)})
+        self.name = name
+        self.handler = handler
+        self.index = index
+
+    def compile(self):
+        index, name, handler = self.index, self.name, self.handler
+
+        def accessor(scope):
+            found = scope[index].get(name)
+            if found is None:
+                return None
+            return handler(found) if handler else found.get('value', '')
+        return accessor
+
+
+class _Computed(Source):
+    def __init__(self, handler, inputs: tuple):
+        names, indexes = set(), {}
+        for entry in inputs:
+            if isinstance(entry, Source):
+                names |= entry.inputs
+                indexes.update(entry.indexes)
+            else:
+                names.add(entry)
+        super().__init__(names, indexes)
+        self.handler = handler
+        self.arguments = inputs
+
+    def compile(self):
+        handler = self.handler
+        getters = [
+            entry.compile() if isinstance(entry, Source) else itemgetter(entry)
+            for entry in self.arguments
+        ]
+        if len(getters) == 1:
+            getter, = getters
+            return lambda scope: handler(getter(scope))
+        if len(getters) == 2:
+            first, second = getters
+            return lambda scope: handler(first(scope), second(scope))
+        return lambda scope: handler(*[getter(scope) for getter in getters])
+
+
+def path(*keys, of: str = DOCUMENT) -> Source:
+    """
+    Value found following keys from the input, '-' if any of them is missing, like
+    utils.get_value does, e.g. path('asset', 'tiers', 'tier1', 'id')
+    """
+    return _Path(keys, of)
+
+
+def header(name: str) -> Source:
+    """
+    Value of an asset header, as utils.compile_header reads it, e.g. header('reseller-id')
+    """
+    return computed(utils.compile_header(name), DOCUMENT)
+
+
+def field(key: str, of: str) -> Source:
+    """
+    Value of key in an input dict, None if the input is empty or has no such key
+    """
+    return _Field(key, of)
+
+
+def param(param_id: str, params: tuple = ASSET_PARAMS, handler=None) -> Source:
+    """
+    Value of the first param with the id, '-' if there is none, like utils.get_param_value
+
+    :param params: path of the params in the document
+    :param handler: function of the param, {} if there is none, returning the value instead
+    """
+    return _Param(param_id, params, handler)
+
+
+def named_param(name: str, params: tuple = ASSET_PARAMS, handler=None) -> Source:
+    """
+    Value of the last param with the name, None if there is none and '' if it has no value
+
+    :param params: path of the params in the document
+    :param handler: function of the param returning the value instead, the one of
+                    utils.ASSET_PARAM_HANDLERS for the name by default
+    """
+    return _NamedParam(name, params, handler or utils.ASSET_PARAM_HANDLERS.get(name))
+
+
+def computed(handler, *inputs) -> Source:
+    """
+    Value handler returns for the inputs, given as names of inputs or as sources, e.g.
+    computed(get_cost, ITEM, PRICING)
+    """
+    return _Computed(handler, inputs)
+
+
+def merged(names: list, of: str) -> MergedColumns:
+    """
+    Columns with the values of an input dict, for the renderers with headers one per name, the
+    input dict merged into the values of the document otherwise: its keys already among the
+    columns replace their values and the others are appended in the order of the dict. An empty
+    input gives None for every name.
+    """
+    return MergedColumns(tuple(names), of)
+
+
+def asset_columns(asset_headers: list, asset_params_headers: list) -> list:
+    """
+    Columns of the asset reports: the asset headers, then the asset params by name, with the
+    renewal date worked out from the creation date of the asset if its param has no value
+
+    :type asset_headers: list
+    :type asset_params_headers: list
+    :param asset_headers: asset headers, see header
+    :param asset_params_headers: names of the asset params
+    :return: list of Column
+    """
+    result = [Column(name, header(name)) for name in asset_headers]
+    for name in asset_params_headers:
+        source = named_param(name)
+        if name == 'renewal_date':
+            source = computed(_get_renewal_date, source, header('created-at'), CONTEXT)
+        result.append(Column(name, source))
+    return result
+
+
+def _get_renewal_date(renewal_date, created: str, context) -> str:
+    return renewal_date or str(context.renewal_date(created))
+
+
+def _param_index(params: tuple, by: str, last=False):
+    # the dict of the utils.ParamIndex of the params read by the sources
+    def index(document):
+        try:
+            value = document
+            for key in params:
+                value = value[key]
+        except Exception:
+            value = None
+        return getattr(utils.ParamIndex(value, last), by)
+    return index
+
+
+class ColumnSpec:
+    """
+    Ordered columns of a report, compiled into its row builder
+
+    :type columns: list
+    :type skip_empty: str
+    :param columns: list of Column and MergedColumns
+    :param items: function of the document returning the items to build a row each for, one
+                  row per document if not given
+    :param row_without_items: whether a document without items gets a row, without the
+                              columns of the item
+    :param skip_empty: name of an item column, the items with '' for it get no row
+    :param row_type: type of the rows, list or tuple
+    """
+
+    def __init__(
+            self, columns: list, items=None, row_without_items=False, skip_empty=None,
+            row_type=list,
+    ):
+        self.columns = tuple(columns)
+        self.items = items
+        self.row_without_items = row_without_items
+        self.skip_empty = skip_empty
+        self.row_type = row_type
+        self.headers = []
+        inputs = set()
+        for column in self.columns:
+            if isinstance(column, MergedColumns):
+                self.headers.extend(column.names)
+                inputs.add(column.of)
+            else:
+                self.headers.append(column.name)
+                inputs |= column.source.inputs
+        self.requires = frozenset(inputs.intersection(ENRICHMENTS))
+
+    def position(self, name: str) -> int:
+        return self.headers.index(name)
+
+    def compile(self, context=None, headed=True):
+        """
+        Returns the row builder of the spec
+
+        :param context: reports.run_context.RunContext of the run, the CONTEXT input
+        :param headed: whether the renderer names the columns by header, see merged
+        :return: function of the document and its enrichments, as keyword arguments named
+                 after them, returning the list of its rows
+        """
+        columns, merge, merged_at = [], None, None
+        for column in self.columns:
+            if not isinstance(column, MergedColumns):
+                columns.append(column)
+            elif headed:
+                columns.extend(Column(name, field(name, column.of)) for name in column.names)
+            elif merge is None:
+                merge, merged_at = column, len(columns)
+            else:
+                raise ValueError('Only one input can be merged')
+
+        indexes, document_columns, item_columns = {}, [], []
+        for position, column in enumerate(columns):
+            indexes.update(column.source.indexes)
+            if ITEM in column.source.inputs:
+                item_columns.append((position, column))
+            else:
+                document_columns.append((position, column))
+        if merge and any(position >= merged_at for position, _ in document_columns):
+            raise ValueError('Merged columns must come after the other columns of the document')
+
+        document_accessors = [column.source.compile() for _, column in document_columns]
+        document_names = [column.name for _, column in document_columns]
+        item_accessors = [column.source.compile() for _, column in item_columns]
+        item_positions = [position for position, _ in item_columns]
+        # the item columns after all the others are appended to the values of the document
+        trailing = item_positions == list(range(len(document_columns), len(columns)))
+        document_positions = [position for position, _ in document_columns]
+        width = len(columns)
+        index_builders = list(indexes.items())
+        get_items = self.items
+        row_without_items = self.row_without_items
+        skip = None
+        if self.skip_empty:
+            skip = [column.name for _, column in item_columns].index(self.skip_empty)
+        row_type = self.row_type
+
+        def build(document: dict, pricing=None, subscription=None) -> list:
+            scope = {
+                DOCUMENT: document, CONTEXT: context, PRICING: pricing, SUBSCRIPTION: subscription,
+            }
+            for key, build_index in index_builders:
+                scope[key] = build_index(document)
+            values = [accessor(scope) for accessor in document_accessors]
+            if merge:
+                named = dict(zip(document_names, values))
+                named.update(scope[merge.of] or dict.fromkeys(merge.names))
+                values = list(named.values())
+            if get_items is None:
+                return [row_type(values)]
+
+            items = get_items(document)
+            if not items:
+                return [row_type(values)] if row_without_items else []
+            if not trailing:
+                template = [None] * width
+                for position, value in zip(document_positions, values):
+                    template[position] = value
+            rows = []
+            for item in items:
+                scope[ITEM] = item
+                item_values = [accessor(scope) for accessor in item_accessors]
+                if skip is not None and item_values[skip] == '':
+                    continue
+                if trailing:
+                    rows.append(row_type(values + item_values))
+                else:
+                    row = template[:]
+                    for position, value in zip(item_positions, item_values):
+                        row[position] = value
+                    rows.append(row_type(row))
+            return rows
+
+        return build
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Streaming output of the asset reports.
+
+With the csv renderer the entrypoints yield a header row and then every row as soon as it is
+built, and with the jsonl (or json) renderer they yield one dict per row, so the rows can be
+written out one at a time by the Connect csv renderer or by write_rows() without keeping the
+report in memory.
+"""
+import csv
+import gzip
+import json
+from contextlib import contextmanager
+
+STREAMING_RENDERERS = ('csv', 'jsonl')
+
+# renderers whose rows carry their headers, as opposed to the ones filling a template
+HEADED_RENDERERS = ('csv', 'json', 'jsonl')
+
+_DICT_RENDERERS = ('json', 'jsonl')
+
+# only row of the asset reports without assets, for the renderers filling a template
+EMPTY_ASSETS = 'EMPTY ASSETS'
+
+
+def get_row_renderer(headers: list, renderer_type: str):
+    """
+    Returns the function turning the rows of a report into what its renderer expects: dicts
+    keyed by header for json and jsonl, rows padded to the headers for csv and the rows as they
+    are for any other renderer
+
+    :type headers: list
+    :type renderer_type: str
+    :param headers: names of the columns of the report
+    :param renderer_type: renderer the report is generated for
+    :return: function of one argument, the row
+    """
+    if renderer_type in _DICT_RENDERERS:
+        def render(row):
+            values = dict.fromkeys(headers)
+            values.update(zip(headers, row))
+            return values
+        return render
+    if renderer_type == 'csv':
+        width = len(headers)
+
+        def render(row):
+            return row + [None] * (width - len(row)) if len(row) < width else row
+        return render
+    return _as_is
+
+
+def _as_is(row):
+    return row
+
+
+def header_rows(headers: list, renderer_type: str) -> list:
+    """
+    Rows to yield before the data: the header row for csv, nothing for the rest, whose headers
+    are in their template or in the keys of each row
+    """
+    return [list(headers)] if renderer_type == 'csv' else []
+
+
+@contextmanager
+def streamed_pages(client):
+    """
+    Makes the resource sets iterated inside the block drop every page once the next one is
+    fetched, instead of appending all of them to the resource set, which keeps the whole
+    collection in memory until the end of the report
+
+    :param client: connect.ConnectClient of the report
+    """
+    append = client.resourceset_append
+    client.resourceset_append = False
+    try:
+        yield client
+    finally:
+        client.resourceset_append = append
+
+
+def leading_rows(headers: list, renderer_type: str, total: int) -> list:
+    """
+    Rows to yield before the data of an asset report: its header_rows and, when there are no
+    assets and the renderer has no headers to show, the EMPTY ASSETS row
+    """
+    rows = header_rows(headers, renderer_type)
+    if total == 0 and renderer_type not in HEADED_RENDERERS:
+        rows.append(EMPTY_ASSETS)
+    return rows
+
+
+@contextmanager
+def row_writer(path: str, renderer_type: str, compress=None):
+    """
+    Opens path for the rows generated for renderer_type and yields the function writing one of
+    them, for the rows pushed one at a time instead of read from an iterable by write_rows
+
+    :type path: str
+    :type renderer_type: str
+    :param path: path of the output file
+    :param renderer_type: csv or jsonl
+    :param compress: whether to gzip the output, by default if path ends with .gz
+    """
+    if renderer_type not in STREAMING_RENDERERS:
+        raise ValueError('Rows cannot be streamed for renderer {}'.format(renderer_type))
+    if compress is None:
+        compress = path.endswith('.gz')
+    opener = gzip.open if compress else open
+    newline = '' if renderer_type == 'csv' else None
+    with opener(path, 'wt', newline=newline, encoding='utf-8') as output:
+        if renderer_type == 'csv':
+            yield csv.writer(output).writerow
+        else:
+            def write(row):
+                output.write(json.dumps(row, default=str))
+                output.write('\n')
+            yield write
+
+
+def write_rows(rows, path: str, renderer_type: str, compress=None) -> int:
+    """
+    Writes the rows generated for renderer_type to path one at a time
+
+    :type path: str
+    :type renderer_type: str
+    :param rows: iterable with the rows yielded by a report entrypoint for renderer_type, csv
+                 or jsonl
+    :param path: path of the output file
+    :param renderer_type: csv or jsonl
+    :param compress: whether to gzip the output, by default if path ends with .gz
+    :return: int with the number of rows written, the header row included
+    """
+    written = 0
+    with row_writer(path, renderer_type, compress) as write:
+        for row in rows:
+            write(row)
+            written += 1
+    return written
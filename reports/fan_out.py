@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Several asset reports for the same parameters from a single pass over the assets.
+
+The line level and subscriptions reports query the same assets and enrich them with the same
+price lists. generate_all() queries the assets once, with the fields of all the reports,
+enriches each of them once, if any of the reports renders financials, and hands it to the row
+builder of every report, which pushes its rows to the sink of that report. Each sink receives
+the same rows, in the same order, as the generate of its report would yield.
+
+    with export.row_writer('lines.csv', 'csv') as lines:
+        with export.row_writer('subs.jsonl', 'jsonl') as subs:
+            fan_out.generate_all(client, input_data, [
+                fan_out.Target(line_level_asset_report.entrypoint, lines, 'csv'),
+                fan_out.Target(subscriptions_report.entrypoint, subs, 'jsonl'),
+            ])
+"""
+from collections import namedtuple
+
+from reports import checkpoint
+from reports import export
+from reports import financials
+from reports import instrumentation
+from reports import row_workers
+from reports import sharding
+from reports import utils
+from reports.pricing import PricingCache
+from reports.run_context import RunContext
+
+# report: entrypoint module of an asset report (asset_fields, column_spec, headers and
+# get_row_builder)
+# sink: function called with each row of the report
+# progress_callback: function called with the assets processed and the total after each asset
+Target = namedtuple(
+    'Target', ('report', 'sink', 'renderer_type', 'progress_callback'), defaults=('csv', None),
+)
+
+
+def generate_all(client, input_data: dict, targets: list) -> int:
+    """
+    Generates the report of each target from one query of the assets
+
+    :type input_data: dict
+    :type targets: list
+    :param client: An instance of the CloudBlue Connect client.
+    :param input_data: report parameters, the same for all the reports
+    :param targets: list of Target
+    :return: int with the number of assets processed
+    """
+    fields, requires = set(), set()
+    for target in targets:
+        fields |= target.report.asset_fields
+        requires |= target.report.column_spec.requires
+    name = '+'.join(target.report.__name__.split('.')[-2] for target in targets)
+
+    with instrumentation.run(name, client), export.streamed_pages(client):
+        assets = sharding.request_assets_with_env(client, input_data, fields)
+        total = assets.count()
+        pricing = PricingCache(client)
+        factories = [(target.report.get_row_builder, target.renderer_type) for target in targets]
+        commitment_filter = utils.CommitmentFilter.for_parameters(
+            input_data, lambda asset: asset['params'],
+        )
+        rows_per_asset = row_workers.rows_per_element(
+            financials.enriched_assets(pricing, commitment_filter(assets), requires),
+            _get_row_builders,
+            (factories, input_data, RunContext()),
+        )
+
+        for target in targets:
+            for row in export.leading_rows(target.report.headers, target.renderer_type, total):
+                target.sink(row)
+        processed = 0
+
+        def progress_callback(counter: int, total: int):
+            nonlocal processed
+            processed = counter
+            for target in targets:
+                if target.progress_callback:
+                    target.progress_callback(counter, total)
+
+        # the rows of an asset are the list of rows of each report, emitted before its progress
+        rows_per_asset = ((element, [rows]) for element, rows in rows_per_asset)
+        for rows_per_target in checkpoint.emit_rows(
+                rows_per_asset, None, 0, total, progress_callback, commitment_filter,
+        ):
+            for target, rows in zip(targets, rows_per_target):
+                for row in rows:
+                    target.sink(row)
+    return processed
+
+
+def _get_row_builders(factories: list, input_data: dict, context: RunContext):
+    """
+    Returns the function building the rows of an enriched asset for every report, as a list
+    with the rows of each
+
+    :param factories: list with the get_row_builder function and the renderer of each report
+    """
+    builders = [
+        get_row_builder(input_data, renderer_type, context)
+        for get_row_builder, renderer_type in factories
+    ]
+
+    def build_rows(asset: dict, marketplace_params: dict) -> list:
+        return [build(asset, marketplace_params) for build in builders]
+
+    return build_rows
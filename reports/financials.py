@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Financials of batches of assets.
+
+The assets of a batch are grouped by price list, and the seats, cost, reseller_cost and msrp
+of every group are summed at once over the PriceTable of the price list, with NumPy when it is
+installed (pip install my-connect-reports[numpy]) and in plain Python otherwise. Both add up
+the items of each asset in their order, so they give the same sums.
+"""
+import itertools
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from reports import columns
+from reports import pipeline
+from reports import settings
+from reports import utils
+from reports.price_table import PriceTable
+
+# assets enriched together, as many as in a page of assets
+BATCH_SIZE = 100
+
+# marketplace params of the assets whose financials cannot be computed
+FALLBACK_PARAMS = {'cost': "0.0", 'reseller_cost': "0.0", 'msrp': "0.0"}
+
+
+def get_financials_and_seats_batch(items_batch: list, table: PriceTable) -> list:
+    """
+    Purchase type, seats and cost, reseller_cost and msrp of each list of items in items_batch
+
+    :type items_batch: list
+    :type table: PriceTable
+    :param items_batch: list with the items of each asset
+    :param table: financials of the price list of the assets
+    :return: list with the dict of each asset, None for the ones whose items cannot be read
+    """
+    results = [None] * len(items_batch)
+    purchase_types = {}
+    owners, quantities, positions = [], [], []
+    for owner, items in enumerate(items_batch):
+        start = len(owners)
+        try:
+            purchase_types[owner] = _get_purchase_type(items)
+            for item in items:
+                quantity = int(item['quantity'])
+                if quantity > 0:
+                    position = table.positions.get(item['global_id'], -1) if table else -1
+                    owners.append(owner)
+                    quantities.append(quantity)
+                    positions.append(position)
+        except Exception:
+            purchase_types.pop(owner, None)
+            del owners[start:], quantities[start:], positions[start:]
+
+    sums = _sum(owners, quantities, positions, table, len(items_batch))
+    for owner, purchase_type in purchase_types.items():
+        results[owner] = {
+            'purchase_type': purchase_type,
+            'cost': float(sums['cost'][owner]),
+            'reseller_cost': float(sums['reseller_cost'][owner]),
+            'msrp': float(sums['msrp'][owner]),
+            'seats': float(sums['seats'][owner]),
+        }
+    return results
+
+
+def _get_purchase_type(items: list):
+    purchase_type = None
+    for item in items:
+        if 'Enterprise' in item['display_name'] and not purchase_type:
+            purchase_type = 'enterprise'
+        elif 'Enterprise' in item['display_name'] and purchase_type == 'team':
+            purchase_type = 'both'
+        else:
+            purchase_type = 'team'
+    return purchase_type
+
+
+def _sum(owners: list, quantities: list, positions: list, table: PriceTable, size: int) -> dict:
+    """
+    Seats of each owner and cost, reseller_cost and msrp of the priced ones, added up in the
+    order of the items
+    """
+    if numpy is not None:
+        owners = numpy.array(owners, dtype=numpy.intp)
+        quantities = numpy.array(quantities, dtype=float)
+        positions = numpy.array(positions, dtype=numpy.intp)
+        sums = {'seats': numpy.bincount(owners, weights=quantities, minlength=size)}
+        known = positions >= 0
+        for name in ('cost', 'reseller_cost', 'msrp'):
+            # the arrays of the table are read in place
+            values = numpy.frombuffer(getattr(table, name), dtype=float)
+            sums[name] = numpy.bincount(
+                owners[known], weights=quantities[known] * values[positions[known]], minlength=size,
+            )
+        return sums
+
+    sums = {name: [0.0] * size for name in ('seats', 'cost', 'reseller_cost', 'msrp')}
+    for owner, quantity, position in zip(owners, quantities, positions):
+        sums['seats'][owner] = sums['seats'][owner] + quantity
+        if position >= 0:
+            for name in ('cost', 'reseller_cost', 'msrp'):
+                sums[name][owner] = sums[name][owner] + quantity * getattr(table, name)[position]
+    return sums
+
+
+def get_marketplace_params(pricing, assets: list) -> list:
+    """
+    Returns the marketplace params of each asset: currency, purchase_type, cost, reseller_cost,
+    msrp, seats and the USD financials, FALLBACK_PARAMS if they cannot be computed or None if
+    there is no listing with a price list for the marketplace and product of the asset
+
+    :type pricing: reports.pricing.PricingCache
+    :type assets: list
+    :param pricing: run-scoped cache of price lists per marketplace and product
+    :param assets: list with assets from connect
+    :return: list with a dict or None per asset
+    """
+    groups = {}
+    for position, asset in enumerate(assets):
+        groups.setdefault((asset['marketplace']['id'], asset['product']['id']), []).append(position)
+
+    params = [None] * len(assets)
+    for (marketplace_id, product_id), positions in groups.items():
+        price_list = pricing.get(marketplace_id, product_id)
+        if not price_list:
+            continue
+        try:
+            if price_list.table is None:
+                raise ValueError(
+                    'Price list points of {} cannot be parsed'.format(price_list.version['id']),
+                )
+            currency = utils.get_currency_and_change(price_list.version, pricing.rates)
+        except Exception:
+            for position in positions:
+                params[position] = dict(FALLBACK_PARAMS)
+            continue
+        batch = get_financials_and_seats_batch(
+            [assets[position].get('items') for position in positions], price_list.table,
+        )
+        for position, financials_and_seats in zip(positions, batch):
+            params[position] = _format(currency, financials_and_seats)
+    return params
+
+
+def _format(currency: dict, financials_and_seats) -> dict:
+    if financials_and_seats is None:
+        return dict(FALLBACK_PARAMS)
+    params = {'currency': currency['currency']}
+    params.update(financials_and_seats)
+    params.update(utils.get_base_currency_financials(financials_and_seats, currency))
+    params['cost'] = '{:0.2f}'.format(params['cost'])
+    params['reseller_cost'] = '{:0.2f}'.format(params['reseller_cost'])
+    params['msrp'] = '{:0.2f}'.format(params['msrp'])
+    return params
+
+
+def enriched_assets(pricing, assets, requires=(columns.PRICING,)):
+    """
+    Yields each asset with its marketplace params, computed per batch of BATCH_SIZE assets in
+    the REPORTS_MAX_WORKERS threads while the assets keep their order
+
+    :type pricing: reports.pricing.PricingCache
+    :param pricing: run-scoped cache of price lists per marketplace and product
+    :param assets: iterable with assets from connect
+    :param requires: enrichments the columns of the report read, see
+                     reports.columns.ColumnSpec, without PRICING the assets are not priced and
+                     their marketplace params are None
+    :return: generator of (asset, marketplace params) tuples, see get_marketplace_params
+    """
+    if columns.PRICING not in requires:
+        return ((asset, None) for asset in assets)
+    enriched_batches = pipeline.ordered_map(
+        lambda batch: zip(batch, get_marketplace_params(pricing, batch)),
+        utils.chunks(assets, BATCH_SIZE),
+        settings.max_workers(),
+        settings.max_in_flight(),
+    )
+    return itertools.chain.from_iterable(enriched_batches)
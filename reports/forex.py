@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import json
+import os
+import threading
+import time
+
+import requests
+
+from reports import api_calls
+from reports import settings
+
+BASE_CURRENCY = 'USD'
+FOREXAPI_URL = 'https://theforexapi.com/api/latest'
+FOREXAPI_TIMEOUT = 10
+
+
+class RateProvider:
+    """
+    Source of the change from a price list currency to BASE_CURRENCY
+    """
+
+    def get_change(self, currency: str) -> float:
+        """
+        :type currency: str
+        :param currency: currency acronym, e.g. EUR
+        :return: float to multiply amounts in currency to get them in BASE_CURRENCY, 0.0 if unknown
+        """
+        raise NotImplementedError
+
+
+class StaticRateProvider(RateProvider):
+    """
+    Rate provider with fixed changes, for tests and runs that must not reach the forex API
+
+    :type rates: dict
+    :param rates: change to BASE_CURRENCY per currency acronym
+    """
+
+    def __init__(self, rates: dict):
+        self.rates = dict(rates)
+        self.rates.setdefault(BASE_CURRENCY, 1.0)
+
+    def get_change(self, currency: str) -> float:
+        return self.rates.get(currency, 0.0)
+
+
+class ForexRateProvider(RateProvider):
+    """
+    Rate provider backed by the forex API.
+
+    The latest rates are fetched once and reused until ttl seconds have passed (for the life of
+    the provider if ttl is None), through a pooled session and with a hard timeout. A failed
+    fetch is remembered as well, so a slow or unavailable forex API costs one timeout per ttl
+    and not one per asset.
+
+    If snapshot_path is given, rates are read from that file when it exists and written to it
+    after a successful fetch otherwise, which allows offline and reproducible runs.
+
+    :type url: str
+    :type timeout: float
+    :type ttl: float
+    :type snapshot_path: str
+    :type session: requests.Session
+    :param url: URL of the forex API, REPORTS_FOREX_URL or FOREXAPI_URL by default
+    """
+
+    def __init__(
+            self, url=None, timeout=FOREXAPI_TIMEOUT, ttl=None, snapshot_path=None, session=None,
+    ):
+        self.url = url or settings.forex_url() or FOREXAPI_URL
+        self.timeout = timeout
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.session = session or requests.Session()
+        self.fetches = 0
+        self._rates = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get_change(self, currency: str) -> float:
+        if currency == BASE_CURRENCY:
+            return 1.0
+        return _cross_rate(self._get_rates(), currency)
+
+    def _get_rates(self) -> dict:
+        with self._lock:
+            if self._rates is None or self._expired():
+                self._rates = self._load_rates()
+                self._loaded_at = time.monotonic()
+            return self._rates
+
+    def _expired(self) -> bool:
+        return self.ttl is not None and time.monotonic() - self._loaded_at >= self.ttl
+
+    def _load_rates(self) -> dict:
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as snapshot:
+                return json.load(snapshot)
+
+        self.fetches += 1
+        response = api_calls.request_get(self.url, session=self.session, timeout=self.timeout)
+        if response.status_code != 200:
+            return {}
+        try:
+            rates = response.json()
+        except ValueError:
+            return {}
+        if self.snapshot_path:
+            with open(self.snapshot_path, 'w') as snapshot:
+                json.dump(rates, snapshot)
+        return rates
+
+
+def _cross_rate(payload: dict, currency: str) -> float:
+    """
+    Change from currency to BASE_CURRENCY out of a forex API payload, whose rates are relative
+    to payload['base']
+
+    :type payload: dict
+    :type currency: str
+    :param payload: dict with base and rates as returned by the forex API
+    :param currency: currency acronym
+    :return: float with the change or 0.0 if the payload does not allow to compute it
+    """
+    rates = payload.get('rates') or {}
+    if BASE_CURRENCY not in rates:
+        return 0.0
+    if currency == payload.get('base', 'EUR'):
+        return float(rates[BASE_CURRENCY])
+    if rates.get(currency):
+        return float(rates[BASE_CURRENCY]) / float(rates[currency])
+    return 0.0
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_default_provider() -> RateProvider:
+    """
+    Process wide provider used when a caller does not pass its own, refreshed every hour
+    """
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = ForexRateProvider(ttl=3600)
+        return _default_provider
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import hashlib
+import json
+import pickle
+import sqlite3
+
+# requests recorded between two commits of the store
+COMMIT_EVERY = 100
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS meta (scope TEXT, key TEXT, value TEXT, PRIMARY KEY (scope, key))',
+    'CREATE TABLE IF NOT EXISTS requests '
+    '(scope TEXT, id TEXT, created TEXT, PRIMARY KEY (scope, id))',
+    'CREATE TABLE IF NOT EXISTS rows (scope TEXT, created TEXT, row BLOB)',
+    'CREATE INDEX IF NOT EXISTS rows_scope_created ON rows (scope, created)',
+)
+
+
+def get_scope(parameters: dict) -> str:
+    """
+    Key of the report parameters other than the date range, rows of runs with different filters
+    are kept apart
+
+    :type parameters: dict
+    :param parameters: report parameters
+    :return: str with a hash of the parameters
+    """
+    filters = {key: value for key, value in parameters.items() if key != 'date'}
+    return hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def to_rql_date(created: str) -> str:
+    """
+    Connect dates are in UTC, the offset is dropped as a raw '+' in a query string is read as a
+    space
+    """
+    return created.replace('+00:00', '').replace('Z', '')
+
+
+class WatermarkStore:
+    """
+    Local store of the rows already emitted for requests ordered by creation date, along with a
+    watermark: the creation date of the last request recorded and the ids of the requests
+    created at that same date.
+
+    A run over [after, before] starts with start(), which forgets the rows created before
+    after and returns the date to query from. The rows kept are replayed with stored_rows(),
+    the requests returned by the query that are already recorded are skipped with
+    is_recorded() and the rest are recorded with record() once their rows are emitted.
+
+    The store is a sqlite database, so several report processes can share it.
+
+    :type path: str
+    :type scope: str
+    :param path: path of the sqlite database
+    :param scope: key of the report parameters, see get_scope
+    """
+
+    commit_every = COMMIT_EVERY
+
+    def __init__(self, path: str, scope: str):
+        self.scope = scope
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        for statement in _SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+        self._recorded_at_watermark = set()
+        self._pending = 0
+
+    def start(self, after: str) -> str:
+        """
+        :type after: str
+        :param after: start of the date range of the run
+        :return: str with the creation date to query requests from
+        """
+        after = to_rql_date(after)
+        covered_from = self._get_meta('covered_from')
+        watermark = self._get_meta('watermark')
+        if covered_from is None or after < covered_from or watermark is None:
+            self._reset()
+            self._set_meta('covered_from', after)
+            self.connection.commit()
+            return after
+
+        self.connection.execute(
+            'DELETE FROM rows WHERE scope = ? AND created < ?', (self.scope, after),
+        )
+        self.connection.execute(
+            'DELETE FROM requests WHERE scope = ? AND created < ?', (self.scope, after),
+        )
+        self._set_meta('covered_from', after)
+        self.connection.commit()
+        self._recorded_at_watermark = {
+            request_id for request_id, in self.connection.execute(
+                'SELECT id FROM requests WHERE scope = ? AND created = ?', (self.scope, watermark),
+            )
+        }
+        return max(after, watermark)
+
+    def stored_rows(self, before: str):
+        """
+        :type before: str
+        :param before: end of the date range of the run
+        :return: generator with the rows stored for requests created up to before, in the order
+                 they were emitted
+        """
+        cursor = self.connection.execute(
+            'SELECT row FROM rows WHERE scope = ? AND created <= ? ORDER BY rowid',
+            (self.scope, to_rql_date(before)),
+        )
+        for row, in cursor:
+            yield pickle.loads(row)
+
+    def is_recorded(self, request_id: str) -> bool:
+        return request_id in self._recorded_at_watermark
+
+    def record(self, request: dict, rows: list, created: str = None):
+        """
+        Stores the rows emitted for request and moves the watermark to its creation date
+
+        :type request: dict
+        :type rows: list
+        :type created: str
+        :param request: request from connect, or any document with an id
+        :param rows: rows emitted for request
+        :param created: creation date of the document, request['created'] by default
+        """
+        created = to_rql_date(created or request['created'])
+        self.connection.execute(
+            'INSERT OR REPLACE INTO requests (scope, id, created) VALUES (?, ?, ?)',
+            (self.scope, request['id'], created),
+        )
+        self.connection.executemany(
+            'INSERT INTO rows (scope, created, row) VALUES (?, ?, ?)',
+            [(self.scope, created, pickle.dumps(row)) for row in rows],
+        )
+        self._set_meta('watermark', created)
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._commit()
+            self._pending = 0
+
+    def recorded(self) -> int:
+        """
+        :return: int with the number of requests recorded before the watermark
+        """
+        count, = self.connection.execute(
+            'SELECT COUNT(*) FROM requests WHERE scope = ? AND created < ?',
+            (self.scope, self._get_meta('watermark') or ''),
+        ).fetchone()
+        return count
+
+    def close(self):
+        self._commit()
+        self.connection.close()
+
+    def _commit(self):
+        self.connection.commit()
+
+    def _reset(self):
+        for table in ('meta', 'requests', 'rows'):
+            self.connection.execute('DELETE FROM {} WHERE scope = ?'.format(table), (self.scope,))
+
+    def _get_meta(self, key: str):
+        row = self.connection.execute(
+            'SELECT value FROM meta WHERE scope = ? AND key = ?', (self.scope, key),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO meta (scope, key, value) VALUES (?, ?, ?)',
+            (self.scope, key, value),
+        )
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Per-run cost report of the calls made to Connect and the forex API.
+
+A report run wrapped in run() records, per endpoint, the HTTP calls, their latency histogram,
+errors, bytes received and collection pages, along with the cache hits that spared a call, and
+how many times each api_calls function was called. At the end of the run the summary is logged
+as one JSON line on the reports.instrumentation logger and handed to the hooks added with
+add_hook().
+
+Runs are only recorded when REPORTS_INSTRUMENTATION is set or a hook is added, otherwise every
+recording function returns right after checking that no run is active.
+"""
+import bisect
+import functools
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from reports import settings
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in milliseconds of the latency histogram buckets, the last one is unbounded
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_BUCKET_NAMES = (
+    ['<={}'.format(bound) for bound in LATENCY_BUCKETS] + ['>{}'.format(LATENCY_BUCKETS[-1])]
+)
+
+_ID_SEGMENT = re.compile(r'/[A-Z]{2,}(?:-[0-9A-Za-z]+)+(?=/|$)')
+
+_hooks = []
+_run = None
+_run_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """
+    Adds a function called with the summary of every run, it enables the instrumentation
+
+    :param hook: function of one argument, the summary dict
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    return bool(_hooks) or settings.instrumentation()
+
+
+def get_endpoint(path: str) -> str:
+    """
+    Endpoint of a path relative to the API root, with the ids replaced, e.g.
+    pricing/versions/PLV-123-456/points -> pricing/versions/{id}/points
+    """
+    return _ID_SEGMENT.sub('/{id}', '/' + path.split('?', 1)[0].strip('/'))[1:]
+
+
+class RunStats:
+    """
+    Numbers recorded during a run, shared by the threads of the run
+    """
+
+    def __init__(self, report: str):
+        self.report = report
+        self.started = time.monotonic()
+        self.endpoints = {}
+        self.functions = {}
+        self._lock = threading.Lock()
+
+    def record_call(self, endpoint: str, seconds: float, size: int, page: bool, error: bool):
+        bucket = _bucket(seconds * 1000)
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['bytes'] += size
+            stats['pages'] += page
+            stats['errors'] += error
+            stats['latency_ms'][bucket] += 1
+
+    def record_cache_hit(self, endpoint: str):
+        with self._lock:
+            self._endpoint(endpoint)['cache_hits'] += 1
+
+    def record_function(self, name: str):
+        with self._lock:
+            self.functions[name] = self.functions.get(name, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            endpoints = {
+                endpoint: dict(
+                    stats,
+                    seconds=round(stats['seconds'], 6),
+                    latency_ms={
+                        bound: count for bound, count in stats['latency_ms'].items() if count
+                    },
+                )
+                for endpoint, stats in self.endpoints.items()
+            }
+            return {
+                'report': self.report,
+                'seconds': round(time.monotonic() - self.started, 6),
+                'calls': sum(stats['calls'] for stats in endpoints.values()),
+                'bytes': sum(stats['bytes'] for stats in endpoints.values()),
+                'endpoints': endpoints,
+                'functions': dict(self.functions),
+            }
+
+    def _endpoint(self, endpoint: str) -> dict:
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {
+                'calls': 0, 'errors': 0, 'pages': 0, 'bytes': 0, 'cache_hits': 0, 'seconds': 0.0,
+                'latency_ms': dict.fromkeys(_BUCKET_NAMES, 0),
+            }
+        return self.endpoints[endpoint]
+
+
+def _bucket(milliseconds: float) -> str:
+    return _BUCKET_NAMES[bisect.bisect_left(LATENCY_BUCKETS, milliseconds)]
+
+
+@contextmanager
+def run(report: str, client=None):
+    """
+    Records the calls made inside the block if the instrumentation is enabled and emits the
+    summary when it exits. A run inside another one records in the outer run.
+
+    :type report: str
+    :param report: name of the report in the summary
+    :param client: connect.ConnectClient of the run, its HTTP calls are recorded
+    """
+    global _run
+    with _run_lock:
+        if _run is not None or not enabled():
+            stats = None
+        else:
+            stats = _run = RunStats(report)
+    if stats is None:
+        yield
+        return
+
+    restore = _instrument_client(client) if client is not None else None
+    try:
+        yield
+    finally:
+        if restore:
+            restore()
+        with _run_lock:
+            _run = None
+        _emit(stats.summary())
+
+
+def _emit(summary: dict):
+    logger.info(json.dumps(summary, sort_keys=True))
+    for hook in list(_hooks):
+        try:
+            hook(summary)
+        except Exception:
+            logger.exception('Instrumentation hook failed')
+
+
+def _instrument_client(client):
+    """
+    Wraps the HTTP calls of client to record them, returns the function undoing it
+    """
+    prefix = urlsplit(client.endpoint).path.rstrip('/')
+    had_own_call = '_execute_http_call' in vars(client)
+    execute_http_call = client._execute_http_call
+
+    def _recorded_http_call(method, url, kwargs):
+        started = time.perf_counter()
+        error = True
+        try:
+            execute_http_call(method, url, kwargs)
+            error = False
+        finally:
+            path = urlsplit(url).path
+            if path.startswith(prefix):
+                path = path[len(prefix):]
+            response = getattr(client, 'response', None)
+            record_call(
+                get_endpoint(path),
+                time.perf_counter() - started,
+                response=response,
+                error=error or response is None or response.status_code >= 400,
+            )
+
+    client._execute_http_call = _recorded_http_call
+
+    def restore():
+        if had_own_call:
+            client._execute_http_call = execute_http_call
+        else:
+            del client._execute_http_call
+    return restore
+
+
+def record_call(endpoint: str, seconds: float, response=None, error=False):
+    """
+    Records an HTTP call of the active run, if any
+
+    :type endpoint: str
+    :type seconds: float
+    :param endpoint: endpoint called, see get_endpoint
+    :param seconds: latency of the call
+    :param response: requests.Response of the call, if any
+    :param error: whether the call failed
+    """
+    stats = _run
+    if stats is None:
+        return
+    size, page = 0, False
+    if response is not None:
+        size = len(response.content or b'')
+        page = 'Content-Range' in response.headers
+    stats.record_call(endpoint, seconds, size, page, error)
+
+
+def record_cache_hit(endpoint: str):
+    """
+    Records a call to endpoint answered by a cache in the active run, if any
+    """
+    stats = _run
+    if stats is not None:
+        stats.record_cache_hit(endpoint)
+
+
+def instrumented(func):
+    """
+    Counts the calls to func in the active run, if any
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _run
+        if stats is not None:
+            stats.record_function(func.__name__)
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import time
+
+from connect.client.utils import parse_content_range
+
+from reports import settings
+
+# pages do not shrink below this limit, whatever they take
+MIN_LIMIT = 10
+
+
+def get_url(path: str, query, select=(), ordering=()) -> str:
+    """
+    Url of a query, with its arguments in the order a connect ResourceSet puts them
+
+    :type path: str
+    :param path: path of the collection
+    :param query: connect R with the filter of the query
+    :param select: select(...) arguments
+    :param ordering: ordering(...) arguments
+    :return: str with the url
+    """
+    arguments = []
+    if select:
+        arguments.append('select({})'.format(','.join(select)))
+    if query:
+        arguments.append(str(query))
+    if ordering:
+        arguments.append('ordering({})'.format(','.join(ordering)))
+    return '{}?{}'.format(path, '&'.join(arguments)) if arguments else path
+
+
+class PagedResourceSet:
+    """
+    Iterates the resources of a connect collection page by page, like a ResourceSet does, with
+    two differences:
+
+    - count() is the total of the Content-Range of the first page, which is fetched then and
+      yielded first by the iteration, instead of a request of its own with limit=0
+    - the limit of each page is sized from the time and the bytes per resource of the previous
+      one, so pages take about REPORTS_PAGE_TARGET_MS and REPORTS_PAGE_MAX_BYTES at most. A
+      limit at most doubles from a page to the next and stays within MIN_LIMIT and
+      REPORTS_MAX_PAGE_LIMIT.
+
+    Pages are offset by the resources already read, so they follow each other whatever their
+    limit, and none is kept once its resources are yielded. Pages are fetched with client.get,
+    from the url of the collection with the RQL select, query and ordering.
+
+    :type path: str
+    :param client: connect.ConnectClient
+    :param path: path of the collection, e.g. the path of client.requests
+    :param query: connect R with the filter of the query
+    :param select: select(...) arguments
+    :param ordering: ordering(...) arguments
+    :param limit: limit of the first page, REPORTS_PAGE_LIMIT by default
+    :param max_limit: max limit of the pages, REPORTS_MAX_PAGE_LIMIT by default
+    """
+
+    def __init__(
+            self, client, path: str, query, select=(), ordering=(), limit: int = None,
+            max_limit: int = None,
+    ):
+        self.client = client
+        self.url = get_url(path, query, select, ordering)
+        self.limit = limit or settings.page_limit()
+        self.max_limit = max(self.limit, max_limit or settings.max_page_limit())
+        self.target_seconds = settings.page_target_ms() / 1000
+        self.max_bytes = settings.page_max_bytes()
+        # limit of every page fetched
+        self.limits = []
+        self._total = None
+        self._first_page = None
+
+    def count(self) -> int:
+        if self._total is None:
+            self._first_page = self._fetch(0)
+        return self._total
+
+    def __iter__(self):
+        page, self._first_page = self._first_page, None
+        if page is None:
+            page = self._fetch(0)
+        offset = 0
+        while page:
+            yield from page
+            offset += len(page)
+            if offset >= self._total:
+                return
+            page = self._fetch(offset)
+
+    def _fetch(self, offset: int) -> list:
+        self.limits.append(self.limit)
+
+        started = time.perf_counter()
+        page = self.client.get(self.url, params={'limit': self.limit, 'offset': offset})
+        seconds = time.perf_counter() - started
+
+        response = self.client.response
+        content_range = parse_content_range(response.headers.get('Content-Range'))
+        # without Content-Range the page is taken as the last one, as the ResourceSet does
+        self._total = content_range.count if content_range else offset + len(page)
+        self._resize(len(page), seconds, len(response.content or b''))
+        return page
+
+    def _resize(self, resources: int, seconds: float, size: int):
+        if not resources:
+            return
+        limit = self.limit * 2
+        if seconds > 0:
+            limit = min(limit, int(resources * self.target_seconds / seconds))
+        if size > 0:
+            limit = min(limit, int(resources * self.max_bytes / size))
+        self.limit = max(min(MIN_LIMIT, self.limit), min(limit, self.max_limit))
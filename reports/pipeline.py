@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def ordered_map(func, iterable, workers: int = 1, max_in_flight: int = None):
+    """
+    Lazily applies func to each element of iterable and yields the results in the order of
+    iterable. With more than one worker func runs in a thread pool, with at most max_in_flight
+    elements submitted and not yet yielded, so memory stays bounded however long iterable is.
+
+    iterable is always consumed from the calling thread, only func runs in the pool.
+
+    :type workers: int
+    :type max_in_flight: int
+    :param func: function of one argument, it must be thread safe when workers > 1
+    :param iterable: elements to apply func to
+    :param workers: number of threads
+    :param max_in_flight: max pending results, 4 per worker by default
+    :return: generator with func(element) for each element
+    """
+    if workers <= 1:
+        for element in iterable:
+            yield func(element)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reports')
+    max_in_flight = max(workers, max_in_flight or workers * 4)
+    yield from _ordered_results(executor, func, iterable, max_in_flight)
+
+
+def process_map(
+        func, iterable, processes: int, max_in_flight: int = None, initializer=None, initargs=(),
+):
+    """
+    ordered_map in a pool of processes, for CPU bound functions. func, the elements and the
+    results are pickled, so func must be a module level function, and what every element needs
+    alike is better set once per process by initializer.
+
+    :type processes: int
+    :type max_in_flight: int
+    :param func: module level function of one argument
+    :param iterable: elements to apply func to
+    :param processes: number of processes
+    :param max_in_flight: max pending results, 2 per process by default
+    :param initializer: module level function called with initargs when each process starts
+    :param initargs: tuple of arguments of initializer
+    :return: generator with func(element) for each element
+    """
+    executor = ProcessPoolExecutor(
+        max_workers=processes, initializer=initializer, initargs=initargs,
+    )
+    max_in_flight = max(processes, max_in_flight or processes * 2)
+    yield from _ordered_results(executor, func, iterable, max_in_flight)
+
+
+def _ordered_results(executor, func, iterable, max_in_flight: int):
+    pending = deque()
+    try:
+        for element in iterable:
+            pending.append(executor.submit(func, element))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
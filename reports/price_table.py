@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from array import array
+
+
+class PriceTable:
+    """
+    Cost, reseller_cost and msrp of the items of a price list version, keyed by item global_id.
+
+    The values are kept in arrays of doubles at the position of each global_id, so a table
+    takes a few bytes per item instead of a dict per item, and NumPy can read the arrays
+    without copying them. The table is built once per version, adding the points one by one as
+    their pages are read.
+
+    Points with price 0 give no financials to their item. When a global_id has several points,
+    the last one with a price wins.
+    """
+    __slots__ = ('positions', 'cost', 'reseller_cost', 'msrp', 'points')
+
+    def __init__(self):
+        self.positions = {}
+        self.cost = array('d')
+        self.reseller_cost = array('d')
+        self.msrp = array('d')
+        self.points = 0
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        :param points: iterable with the price points of a price list version
+        :return: PriceTable with the financials of the points
+        """
+        table = cls()
+        for point in points:
+            table.add(point)
+        return table
+
+    def add(self, point: dict):
+        self.points += 1
+        attributes = point['attributes']
+        price = float(attributes['price'])
+        if price == 0.0:
+            return
+        reseller_cost = float(attributes['st0p']) if 'st0p' in attributes else 0.0
+        msrp = float(attributes['st1p']) if 'st1p' in attributes else 0.0
+        global_id = point['item']['global_id']
+        position = self.positions.get(global_id)
+        if position is None:
+            self.positions[global_id] = len(self.cost)
+            self.cost.append(price)
+            self.reseller_cost.append(reseller_cost)
+            self.msrp.append(msrp)
+        else:
+            self.cost[position] = price
+            self.reseller_cost[position] = reseller_cost
+            self.msrp[position] = msrp
+
+    def subset(self, global_ids):
+        """
+        :param global_ids: iterable with global_ids of items
+        :return: PriceTable with the financials of the items of global_ids only
+        """
+        table = PriceTable()
+        table.points = self.points
+        for global_id in global_ids:
+            position = self.positions.get(global_id)
+            if position is not None and global_id not in table.positions:
+                table.positions[global_id] = len(table.cost)
+                table.cost.append(self.cost[position])
+                table.reseller_cost.append(self.reseller_cost[position])
+                table.msrp.append(self.msrp[position])
+        return table
+
+    def get(self, global_id: str, name: str, default='-'):
+        """
+        :type global_id: str
+        :type name: str
+        :param global_id: global_id of the item
+        :param name: cost, reseller_cost or msrp
+        :param default: value returned if the item has no financials
+        :return: float with the value of the item or default
+        """
+        position = self.positions.get(global_id)
+        if position is None:
+            return default
+        return getattr(self, name)[position]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, global_id):
+        return global_id in self.positions
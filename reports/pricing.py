@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import threading
+from collections import namedtuple
+
+from reports import api_calls
+from reports import forex
+from reports import utils
+
+# table is a reports.price_table.PriceTable, None if the points cannot be parsed
+PriceList = namedtuple('PriceList', ('version', 'table'))
+
+
+class PricingCache:
+    """
+    Run-scoped memo of the listing -> price list version -> price points chain.
+
+    Every asset or request of the same marketplace and product is priced with the same price
+    list, so the chain is resolved once per (marketplace, product) pair and reused for the rest
+    of the run. Pairs without a listed price list or without an active, filled version are
+    remembered as well, so they do not trigger new lookups either. The cache can be shared by
+    threads, a pair being resolved is waited for instead of being requested again.
+
+    The cache also carries the rate provider used to convert the price list currencies, a
+    forex API provider that fetches the rates once per run unless another one is given.
+
+    :type client: connect.ConnectClient
+    :type rates: reports.forex.RateProvider
+    :param client: connect.ConnectClient used for the lookups
+    :param rates: provider of the changes to USD
+    """
+
+    def __init__(self, client, rates=None):
+        self.client = client
+        self.rates = rates or forex.ForexRateProvider()
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._pair_locks = {}
+
+    def get(self, marketplace_id: str, product_id: str):
+        """
+        Returns the price list used for the product at the marketplace
+
+        :type marketplace_id: str
+        :type product_id: str
+        :param marketplace_id: id of the marketplace of the asset
+        :param product_id: id of the product of the asset
+        :return: PriceList with the active version and its financials or None if there is no
+                 listing, no active version or no points for the pair
+        """
+        key = (marketplace_id, product_id)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            pair_lock = self._pair_locks.setdefault(key, threading.Lock())
+        with pair_lock:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+            entry = _load_price_list(self.client, marketplace_id, product_id)
+            with self._lock:
+                self._entries[key] = entry
+                self._pair_locks.pop(key, None)
+            return entry
+
+    def get_table(self, marketplace_id: str, product_id: str):
+        """
+        Returns the financials of the price list used for the pair, or None if they are not
+        available for any reason
+
+        :type marketplace_id: str
+        :type product_id: str
+        :param marketplace_id: id of the marketplace of the request
+        :param product_id: id of the product of the request
+        :return: reports.price_table.PriceTable with cost, reseller_cost and msrp per item
+                 global_id, or None
+        """
+        try:
+            price_list = self.get(marketplace_id, product_id)
+        except Exception:
+            return None
+        if not price_list:
+            return None
+        return price_list.table
+
+    def entries(self) -> dict:
+        """
+        :return: dict with the PriceList or None resolved so far per (marketplace, product)
+        """
+        with self._lock:
+            return dict(self._entries)
+
+    def preload(self, entries: dict):
+        """
+        Adds pairs resolved by a previous run, as returned by entries(), so they are not looked
+        up again
+        """
+        with self._lock:
+            self._entries.update(entries)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+def _load_price_list(client, marketplace_id: str, product_id: str):
+    listing = api_calls.request_listing(client, marketplace_id, product_id)
+    if not listing or not listing.get('pricelist'):
+        return None
+    price_list_version = api_calls.request_price_list(client, listing['pricelist']['id'])
+    if not price_list_version:
+        return None
+    price_list_points = api_calls.request_price_list_version_points(
+        client, price_list_version['id'],
+    )
+    try:
+        table = utils.get_financials_from_price_list(price_list_points)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        # points that cannot be parsed are reported by the callers as missing financials
+        return PriceList(price_list_version, None)
+    if not table.points:
+        return None
+    return PriceList(price_list_version, table)
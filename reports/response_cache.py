@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import json
+import sqlite3
+import threading
+import time
+
+from reports import instrumentation
+from reports import settings
+
+# seconds a response stays valid per resource, None for ever. Points of a filled price list
+# version never change, listings and the active version of a price list may change at any time
+TTLS = {
+    'listings': 15 * 60,
+    'price_list_versions': 60 * 60,
+    'price_list_points': None,
+}
+
+# accessed dates are not written again before this many seconds, to keep reads read-only
+TOUCH_INTERVAL = 60
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS responses ('
+    'key TEXT PRIMARY KEY, resource TEXT, value TEXT, size INTEGER, stored REAL, accessed REAL)',
+    'CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)',
+)
+
+
+class ResponseCache:
+    """
+    On-disk cache of Connect responses shared by report runs and processes.
+
+    Responses are stored as JSON in a sqlite database in WAL mode, keyed by endpoint and RQL
+    query, and expire after the ttl of their resource in TTLS. Resources not in TTLS, such as
+    assets, are never cached. When the stored responses take more than max_bytes, the least
+    recently used ones are evicted.
+
+    :type path: str
+    :type max_bytes: int
+    :param path: path of the sqlite database
+    :param max_bytes: max size of the stored responses
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def cached(self, resource: str, key: str, fetch):
+        """
+        Returns the stored response for key or fetches and stores it
+
+        :type resource: str
+        :type key: str
+        :param resource: resource of the response, the key of its ttl in TTLS
+        :param key: endpoint and query of the response
+        :param fetch: function without arguments returning the response
+        :return: the response, as JSON types
+        """
+        if resource not in TTLS:
+            return fetch()
+        found, value = self.get(key, TTLS[resource])
+        if found:
+            return value
+        value = fetch()
+        self.set(resource, key, value)
+        return value
+
+    def get(self, key: str, ttl=None) -> tuple:
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value, stored, accessed FROM responses WHERE key = ?', (key,),
+        ).fetchone()
+        if row is None or (ttl is not None and now - row[1] > ttl):
+            self._count(hit=False)
+            return False, None
+        if now - row[2] > TOUCH_INTERVAL:
+            with self._connection() as connection:
+                connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+        self._count(hit=True)
+        return True, json.loads(row[0])
+
+    def set(self, resource: str, key: str, value):
+        now = time.time()
+        serialized = json.dumps(value)
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (key, resource, value, size, stored, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, resource, serialized, len(serialized), now, now),
+            )
+            self._evict(connection)
+
+    def _evict(self, connection):
+        total, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        oldest_first = connection.execute(
+            'SELECT key, size FROM responses ORDER BY accessed',
+        ).fetchall()
+        for key, size in oldest_first:
+            if total - evicted <= self.max_bytes:
+                break
+            connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            evicted += size
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _connection(self):
+        if not hasattr(self._local, 'connection'):
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._local.connection = connection
+        return self._local.connection
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the cache at REPORTS_RESPONSE_CACHE, or None if it is not set
+    """
+    path = settings.response_cache()
+    if not path:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = ResponseCache(path, settings.response_cache_size())
+        return _caches[path]
+
+
+def cached(client, resource: str, query: str, fetch):
+    """
+    Same as ResponseCache.cached on the configured cache, calls fetch if there is none
+
+    :type resource: str
+    :type query: str
+    :param client: connect.ConnectClient doing the request, its endpoint is part of the key
+    :param resource: resource of the response, the key of its ttl in TTLS
+    :param query: path and RQL query of the request
+    :param fetch: function without arguments returning the response
+    """
+    cache = get_cache()
+    if cache is None:
+        return fetch()
+    fetched = []
+
+    def _fetch():
+        fetched.append(True)
+        return fetch()
+
+    value = cache.cached(resource, '{}/{}'.format(client.endpoint, query), _fetch)
+    if not fetched:
+        instrumentation.record_cache_hit(instrumentation.get_endpoint(query))
+    return value
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Row building in a pool of processes, for the runs whose rows take more CPU than a core has.
+
+Querying and enriching stay in the process generating the report, only the enriched assets or
+requests are sent to the REPORTS_PROCESSES processes, in batches. Every process builds its row
+builder once, when it starts, from the get_row_builder function of the report and its
+arguments, so nothing shared by the rows (parameters, run clock, headers) is pickled with each
+batch. The rows come back in the order of the assets or requests.
+"""
+import itertools
+
+from reports import pipeline
+from reports import settings
+from reports import utils
+
+# assets or requests sent to a process at once
+BATCH_SIZE = 100
+
+# row builder of the process, set by _initialize
+_build_rows = None
+
+
+def rows_per_element(elements, get_row_builder, args: tuple, processes: int = None):
+    """
+    Yields each element with the rows get_row_builder(*args) builds for it, in the order of
+    elements, in a pool of processes if there are more than one
+
+    :type args: tuple
+    :type processes: int
+    :param elements: iterable of tuples with the arguments of the row builder
+    :param get_row_builder: module level function returning the row builder of a report
+    :param args: arguments of get_row_builder, they are pickled once per process
+    :param processes: number of processes, REPORTS_PROCESSES by default
+    :return: generator of (element, rows) tuples
+    """
+    processes = settings.processes() if processes is None else processes
+    if processes <= 1:
+        build_rows = get_row_builder(*args)
+        for element in elements:
+            yield element, build_rows(*element)
+        return
+
+    # the batches sent are kept here until their rows are back, at most as many as in flight
+    batches, sent = itertools.tee(utils.chunks(elements, BATCH_SIZE))
+    built = pipeline.process_map(
+        _build_batch, sent, processes, initializer=_initialize, initargs=(get_row_builder, args),
+    )
+    for batch, rows in zip(batches, built):
+        yield from zip(batch, rows)
+
+
+def _initialize(get_row_builder, args: tuple):
+    global _build_rows
+    _build_rows = get_row_builder(*args)
+
+
+def _build_batch(batch: list) -> list:
+    return [_build_rows(*element) for element in batch]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from datetime import datetime, timezone
+
+from reports import utils
+
+
+class RunContext:
+    """
+    Clock of a report run, read once when the run starts so every row of the run is built
+    with the same now: the same "Exported At" and the same renewal dates from the first row to
+    the last. Renewal dates are memoized by asset creation date, which many assets share.
+
+    :type now: datetime
+    :param now: aware datetime the run is done at, the current time if not given
+    """
+
+    __slots__ = ('now', 'today', 'exported_at', '_renewal_dates')
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now(timezone.utc)
+        # renewal dates are computed from the UTC date, the export date is in local time
+        self.today = self.now.astimezone(timezone.utc).date()
+        self.exported_at = self.now.astimezone().strftime('%Y-%m-%d %H:%M:%S')
+        self._renewal_dates = {}
+
+    def renewal_date(self, asset_creation_date: str):
+        """
+        Next renewal date of an asset on the day the run is done at
+
+        :type asset_creation_date: str
+        :param asset_creation_date: ISO-8601 creation date of the asset
+        :return: date of the next renewal of the asset
+        """
+        key = asset_creation_date[:10]
+        renewal_date = self._renewal_dates.get(key)
+        if renewal_date is None:
+            renewal_date = utils.calculate_renewal_date(asset_creation_date, self.today)
+            self._renewal_dates[key] = renewal_date
+        return renewal_date
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Execution options of the report entrypoints.
+
+Connect only hands the report parameters to ``generate``, so options about how a report is
+produced (never about what it contains) are read from the environment of the report runner.
+"""
+import os
+
+
+def get_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def max_workers() -> int:
+    """
+    Threads used to enrich assets and requests with pricing, subscriptions and FX. 1 keeps the
+    enrichment in the thread that generates the rows.
+    """
+    return max(1, get_int('REPORTS_MAX_WORKERS', 1))
+
+
+def max_in_flight() -> int:
+    """
+    Max assets or requests being enriched at the same time, bounds the memory of the pool
+    """
+    return max(max_workers(), get_int('REPORTS_MAX_IN_FLIGHT', max_workers() * 4))
+
+
+def shard_size() -> int:
+    """
+    Max assets per date window when the asset queries are sharded, 0 disables sharding
+    """
+    return max(0, get_int('REPORTS_SHARD_SIZE', 0))
+
+
+def incremental_store() -> str:
+    """
+    Path of the sqlite store of the incremental mode of the approved requests report, which
+    keeps the rows already emitted and only queries requests created after them
+    """
+    return os.environ.get('REPORTS_INCREMENTAL_STORE') or None
+
+
+def response_cache() -> str:
+    """
+    Path of the sqlite cache of pricing responses shared by report runs, no cache if not set
+    """
+    return os.environ.get('REPORTS_RESPONSE_CACHE') or None
+
+
+def response_cache_size() -> int:
+    """
+    Max size in bytes of the responses kept in the response cache, 256 MB by default
+    """
+    return get_int('REPORTS_RESPONSE_CACHE_SIZE', 256 * 1024 * 1024)
+
+
+def instrumentation() -> bool:
+    """
+    Whether report runs log a summary of their calls to Connect, see reports.instrumentation
+    """
+    return os.environ.get('REPORTS_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+
+
+def trace() -> bool:
+    """
+    Whether every asset and request is traced, see reports.trace
+    """
+    return os.environ.get('REPORTS_TRACE', '').lower() in ('1', 'true', 'yes')
+
+
+def trace_ids() -> set:
+    """
+    Ids of the assets and requests traced, comma separated in REPORTS_TRACE_IDS
+    """
+    return {
+        document_id.strip()
+        for document_id in os.environ.get('REPORTS_TRACE_IDS', '').split(',')
+        if document_id.strip()
+    }
+
+
+def trace_sample() -> int:
+    """
+    Traces one asset or request in REPORTS_TRACE_SAMPLE, 0 for none
+    """
+    return max(0, get_int('REPORTS_TRACE_SAMPLE', 0))
+
+
+def page_limit() -> int:
+    """
+    Limit of the first page of the assets and requests queried, later pages are sized from it,
+    see reports.paging
+    """
+    return max(1, get_int('REPORTS_PAGE_LIMIT', 100))
+
+
+def max_page_limit() -> int:
+    """
+    Max limit the pages grow to, at most the 1000 resources Connect returns per page. Set it to
+    REPORTS_PAGE_LIMIT to keep every page the same size.
+    """
+    return min(1000, max(page_limit(), get_int('REPORTS_MAX_PAGE_LIMIT', 1000)))
+
+
+def page_target_ms() -> int:
+    """
+    Time a page should take to be fetched, pages taking less grow and pages taking more shrink
+    """
+    return max(1, get_int('REPORTS_PAGE_TARGET_MS', 1000))
+
+
+def page_max_bytes() -> int:
+    """
+    Max size in bytes of the body of a page, 4 MB by default
+    """
+    return max(1, get_int('REPORTS_PAGE_MAX_BYTES', 4 * 1024 * 1024))
+
+
+def processes() -> int:
+    """
+    Processes building the rows of the reports from the enriched assets and requests, see
+    reports.row_workers. 0 or 1 builds them in the process generating the report.
+    """
+    return max(0, get_int('REPORTS_PROCESSES', 0))
+
+
+def checkpoint() -> str:
+    """
+    Path of the sqlite file the asset and approved requests reports save their progress to, to
+    resume a failed run where it stopped, see reports.checkpoint
+    """
+    return os.environ.get('REPORTS_CHECKPOINT') or None
+
+
+def checkpoint_every() -> int:
+    """
+    Assets or requests processed between two saves of the checkpoint
+    """
+    return max(1, get_int('REPORTS_CHECKPOINT_EVERY', 1000))
+
+
+def forex_url() -> str:
+    """
+    URL of the forex API the rates are fetched from, theforexapi.com if not set
+    """
+    return os.environ.get('REPORTS_FOREX_URL') or None
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from reports import api_calls
+from reports import incremental
+from reports import pipeline
+from reports import settings
+
+# shards are not split below this duration, events.created.at has a precision of seconds
+MIN_SHARD_DURATION = timedelta(seconds=1)
+
+# assets created in [after, before), or [after, before] for the last shard of the range
+Shard = namedtuple('Shard', ('after', 'before', 'last', 'size'))
+
+
+def request_assets_with_env(client, input_data: dict, fields=None, ordering=()):
+    """
+    Same as api_calls.request_assets_with_env, but sharded when REPORTS_SHARD_SIZE is set and
+    paged by paging.PagedResourceSet. Sharded assets are always ordered by
+    ShardedAssets.ordering.
+    """
+    if settings.shard_size():
+        return ShardedAssets(
+            client, input_data, fields, settings.shard_size(), settings.max_workers(),
+        )
+    return api_calls.page_assets_with_env(client, input_data, fields, ordering=ordering)
+
+
+class ShardedAssets:
+    """
+    Drop-in replacement of api_calls.request_assets_with_env for large date ranges.
+
+    The events.created.at range of input_data is split in consecutive windows with at most
+    shard_size assets each. Windows are sized from the counts of their parent windows, counted
+    and paged by workers threads at the same time, and yielded back one after the other ordered
+    by creation date and id. Windows are half-open, so an asset created at the edge of two
+    windows belongs only to the later one and none is skipped or repeated.
+
+    :type client: connect.ConnectClient
+    :type input_data: dict
+    :type shard_size: int
+    :type workers: int
+    :param client: connect.ConnectClient
+    :param input_data: report parameters, as for request_assets_with_env
+    :param fields: asset fields read by the report
+    :param shard_size: max assets per window
+    :param workers: windows counted or paged at the same time
+    """
+
+    ordering = ('events.created.at', 'id')
+
+    def __init__(
+            self, client, input_data: dict, fields=None, shard_size: int = 2000, workers: int = 1,
+    ):
+        self.client = client
+        self.input_data = input_data
+        self.fields = fields
+        self.shard_size = shard_size
+        self.workers = workers
+        self._shards = None
+
+    def count(self) -> int:
+        return sum(shard.size for shard in self.shards())
+
+    def shards(self) -> list:
+        if self._shards is None:
+            self._shards = self._plan()
+        return self._shards
+
+    def __iter__(self):
+        pages = pipeline.ordered_map(self._fetch, self.shards(), self.workers, self.workers)
+        for assets in pages:
+            yield from assets
+
+    def _plan(self) -> list:
+        after = _parse_datetime(self.input_data['date']['after'])
+        before = _parse_datetime(self.input_data['date']['before'])
+        shards = []
+        pending = [Shard(after, before, True, None)]
+        while pending:
+            counted = pipeline.ordered_map(
+                lambda shard: shard._replace(size=self._query(shard).count()),
+                pending,
+                self.workers,
+            )
+            pending = []
+            for shard in counted:
+                if shard.size == 0:
+                    continue
+                small = shard.size <= self.shard_size
+                if small or shard.before - shard.after <= MIN_SHARD_DURATION:
+                    shards.append(shard)
+                else:
+                    pending.extend(_split(shard, math.ceil(shard.size / self.shard_size)))
+        return sorted(shards, key=lambda shard: shard.after)
+
+    def _fetch(self, shard: Shard) -> list:
+        # windows are counted with limit=0 to be planned, and paged once planned
+        return list(self._query(shard, paged=True))
+
+    def _query(self, shard: Shard, paged: bool = False):
+        input_data = dict(self.input_data)
+        input_data['date'] = {
+            'after': _to_rql_date(shard.after),
+            'before': _to_rql_date(shard.before),
+        }
+        request = api_calls.page_assets_with_env if paged else api_calls.request_assets_with_env
+        return request(
+            self.client,
+            input_data,
+            self.fields,
+            exclude_before=not shard.last,
+            ordering=self.ordering,
+        )
+
+
+def _split(shard: Shard, parts: int) -> list:
+    """
+    Splits shard in at most parts consecutive shards of the same duration, whole seconds each
+    """
+    seconds = (shard.before - shard.after).total_seconds()
+    step = max(MIN_SHARD_DURATION.total_seconds(), math.ceil(seconds / max(parts, 2)))
+    edges = []
+    edge = shard.after
+    while edge < shard.before:
+        edges.append(edge)
+        edge = edge + timedelta(seconds=step)
+    edges.append(shard.before)
+    return [
+        Shard(start, end, shard.last and end == shard.before, None)
+        for start, end in zip(edges, edges[1:])
+    ]
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _to_rql_date(edge: datetime) -> str:
+    """
+    Edge of a window as a date of the RQL query, in UTC without offset
+    """
+    if edge.tzinfo is not None:
+        edge = edge.astimezone(timezone.utc)
+    return incremental.to_rql_date(edge.isoformat())
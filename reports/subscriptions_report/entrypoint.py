@@ -3,8 +3,14 @@
 # Copyright (c) 2022, Carlos Anuarbe
 # All rights reserved.
 
-from reports import api_calls
+import sys
+
+from reports import checkpoint
+from reports import columns
+from reports import export
+from reports import trace
 from reports import utils
+from reports.run_context import RunContext
 
 asset_headers = [
     'id', 'status', 'external_id', 'product-id', 'marketplace-id',
@@ -18,10 +24,14 @@ asset_params_headers = [
     'recommitment_status', 'recommitment_start_date', 'recommitment_end_date'
 ]
 
-marketplace_headers = [
-    'currency', 'cost', 'reseller_cost', 'msrp', 'seats', 'USD-cost', 'USD-msrp',
-    'USD-reseller_cost'
-]
+# columns of the rows, the marketplace params are not part of them
+column_spec = columns.ColumnSpec(columns.asset_columns(asset_headers, asset_params_headers))
+
+# columns of the rows, in the header row of the csv renderer and the keys of the json ones
+headers = column_spec.headers
+
+# asset fields read to build a line, the rest are left out of the responses
+asset_fields = utils.get_asset_fields(asset_headers) | {'params', 'items', 'marketplace', 'product'}
 
 
 def generate(
@@ -58,95 +68,30 @@ def generate(
     :type extra_context_callback: func
     """
 
-    assets = api_calls.request_assets_with_env(client, input_data)
-    total = assets.count()
-
-    counter = 0
-    if total == 0:
-        yield 'EMPTY ASSETS'
-    for asset in assets:
-        marketplace_params = _get_marketplace_params(client, asset)
-        if not marketplace_params:
-            marketplace_params = dict.fromkeys(marketplace_headers)
-        # assets need to be in a list to yield
-        if "commitment_status" in input_data and input_data['commitment_status'] == '3yc':
-            # print(asset['id'])
-            # print(utils.get_param_value_by_name(asset['params'], 'commitment_status'))
-            if utils.get_param_value_by_name(asset['params'], 'commitment_status') == '-' \
-                    or utils.get_param_value_by_name(asset['params'], 'commitment_status') == '':
-                counter += 1
-                progress_callback(counter, total)
-                continue
-        items = asset['items']
-        if items:
-            print("Asset ID {}, items {}".format(asset['id'], items))
-        else:
-            print("Asset ID {}, items count 0".format(asset['id']))
-        yield _process_line(asset, marketplace_params)
-        counter += 1
-        progress_callback(counter, total)
-
-
-def _process_line(asset: dict, marketplace_params: dict) -> list:
-    """
-    This functions uses several functions on this file to build a line with values to yield at xlsx file
+    yield from checkpoint.generate_assets(
+        client, sys.modules[__name__], input_data, progress_callback, renderer_type,
+    )
 
-    :param asset: one asset from requested assets
-    :param marketplace_params: dict to build the line
-    :return: list with line values
-    """
-    asset_values = utils.process_asset_headers(asset, asset_headers)
-    asset_values.update(utils.process_asset_parameters_by_name(asset['params'], asset_params_headers))
 
-    if not asset_values['renewal_date']:
-        asset_values['renewal_date'] = str(utils.handle_renewal_date(asset_values['created-at']))
+def get_row_builder(input_data: dict, renderer_type: str, context: RunContext):
+    """
+    Returns the function building the rows of an asset enriched by financials.enriched_assets,
+    one per asset
 
-    # asset_values.update(marketplace_params)
-    return list(asset_values.values())
+    :type input_data: dict
+    :type renderer_type: str
+    :type context: RunContext
+    :param input_data: report parameters
+    :param renderer_type: renderer the rows are generated for
+    :param context: clock of the report run
+    :return: function of the asset and its marketplace params returning a list of rows
+    """
+    render = export.get_row_renderer(headers, renderer_type)
+    tracer = trace.get_tracer()
+    rows_of = column_spec.compile(context)
 
+    def build_rows(asset: dict, marketplace_params: dict) -> list:
+        tracer.trace(asset['id'], 'items %r', asset['items'])
+        return [render(row) for row in rows_of(asset)]
 
-def _get_marketplace_params(client, asset):
-    """
-    This function returns a dict with key,value pairs for each marketplace_header or None if there is no listing
-    for the marketplace and product in asset
-
-    :type client: connect.ConnectClient
-    :type asset: dict
-    :param client: connect.ConnectClient
-    :param asset: dict with asset from connect
-    :return: dict if listing or None
-    """
-    listing = api_calls.request_listing(client, asset['marketplace']['id'], asset['product']['id'])
-    if listing and 'pricelist' in listing:
-        price_list_version = api_calls.request_price_list(client, listing['pricelist']['id'])
-        price_list_points = api_calls.request_price_list_version_points(client, price_list_version['id']) \
-            if price_list_version else []
-        if price_list_version and price_list_points:
-            try:
-                # dict with currency and currency change
-                currency = utils.get_currency_and_change(price_list_version)
-
-                # dict with all financials from all items in price list
-                price_list_financials = utils.get_financials_from_price_list(price_list_points)
-
-                # dict with seats and financials from assets items
-                financials_and_seats = utils.get_financials_and_seats(asset['items'], price_list_financials)
-
-                # dict with financials in USD
-                base_financials = utils.get_base_currency_financials(financials_and_seats, currency)
-                currency.pop('change')
-                currency.update(financials_and_seats)
-                currency.update(base_financials)
-                currency['cost'] = '{:0.2f}'.format(currency['cost'])
-                currency['reseller_cost'] = '{:0.2f}'.format(currency['reseller_cost'])
-                currency['msrp'] = '{:0.2f}'.format(currency['msrp'])
-                return currency
-            except:
-                currency = {
-                    'cost': "0.0",
-                    'reseller_cost': "0.0",
-                    'msrp': "0.0"
-                }
-                return currency
-    # Listing has no price list or is not active
-    return None
\ No newline at end of file
+    return build_rows
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Debug trace of the assets and requests processed by the reports.
+
+Tracing is off by default and then get_tracer() returns a tracer whose methods do nothing, so
+trace calls cost a method call and never format their arguments. It is turned on with
+REPORTS_TRACE for every document, REPORTS_TRACE_IDS for a comma separated list of ids or
+REPORTS_TRACE_SAMPLE=N for one in N documents, picked by id so every run traces the same ones.
+
+Messages go to the reports.trace logger at DEBUG level with the id in the record, formatted by
+logging only when they are emitted.
+"""
+import logging
+import zlib
+
+from reports import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """
+    Emits the trace messages of the documents selected
+
+    :type everything: bool
+    :type ids: set
+    :type sample: int
+    :param everything: trace every document
+    :param ids: ids of the documents traced
+    :param sample: trace one document in sample, 0 for none
+    """
+
+    def __init__(self, everything=False, ids=(), sample=0):
+        self.everything = everything
+        self.ids = frozenset(ids)
+        self.sample = sample
+
+    def wants(self, document_id: str) -> bool:
+        return (
+            self.everything
+            or document_id in self.ids
+            or (self.sample > 0 and zlib.crc32(document_id.encode()) % self.sample == 0)
+        )
+
+    def trace(self, document_id: str, message: str, *args):
+        """
+        Logs message % args for the document if it is traced
+
+        :type document_id: str
+        :type message: str
+        :param document_id: id of the asset or request, e.g. AS-1234-5678-9012
+        :param message: %-style format of the message
+        :param args: values of message, formatted only if the message is emitted
+        """
+        if self.wants(document_id):
+            logger.debug('%s: ' + message, document_id, *args, extra={'document_id': document_id})
+
+
+class NullTracer:
+    """
+    Tracer used while tracing is off
+    """
+
+    def wants(self, document_id: str) -> bool:
+        return False
+
+    def trace(self, document_id: str, message: str, *args):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def get_tracer():
+    """
+    Returns the tracer configured by the environment, created once per report run
+    """
+    everything, ids, sample = settings.trace(), settings.trace_ids(), settings.trace_sample()
+    if not (everything or ids or sample):
+        return NULL_TRACER
+    if logger.getEffectiveLevel() > logging.DEBUG:
+        logger.setLevel(logging.DEBUG)
+    if not logger.hasHandlers():
+        logger.addHandler(logging.StreamHandler())
+    return Tracer(everything, ids, sample)
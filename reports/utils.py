@@ -1,32 +1,158 @@
-from reports import api_calls
+from reports import forex
+from reports import trace
+from reports.price_table import PriceTable
 from datetime import datetime, timezone, date
 import calendar
 import json
 
-BASE_CURRENCY = 'USD'
-FOREXAPI_URL = 'https://theforexapi.com/api/latest'
+BASE_CURRENCY = forex.BASE_CURRENCY
+FOREXAPI_URL = forex.FOREXAPI_URL
 
+# path in the asset to the object holding the value of headers like created-at,
+# see get_value_from_split_header
+SPLIT_HEADER_PATHS = {
+    'created': ('events', 'created'),
+    'provider': ('connection', 'provider'),
+    'customer': ('tiers', 'customer'),
+    'reseller': ('tiers', 'tier1'),
+}
 
-def get_param_value_by_name(params: list, value: str) -> str:
-    try:
-        if params[0]['name'] == value:
-            return params[0]['value']
-        if len(params) == 1:
-            return '-'
-        return get_param_value_by_name(list(params[1:]), value)
-    except Exception:
-        return '-'
 
+class ParamIndex:
+    """
+    Index of asset or request params by id and by name, each built in one pass over the params
+    on first use so that every lookup afterwards is a dict access. When several params share an
+    id or a name the first one wins, as in a scan of the list, or the last one if last is set.
+
+    :type params: list
+    :type last: bool
+    :param params: params from connect, e.g. asset['params']
+    :param last: whether the last param of an id or a name wins
+    """
 
-def get_param_value(params: list, value: str) -> str:
-    try:
-        if params[0]['id'] == value:
-            return params[0]['value']
-        if len(params) == 1:
-            return '-'
-        return get_param_value(list(params[1:]), value)
-    except Exception:
-        return '-'
+    __slots__ = ('params', 'last', '_by_id', '_by_name')
+
+    def __init__(self, params: list, last: bool = False):
+        self.params = params or ()
+        self.last = last
+        self._by_id = None
+        self._by_name = None
+
+    @property
+    def by_id(self) -> dict:
+        if self._by_id is None:
+            self._by_id = self._index('id')
+        return self._by_id
+
+    @property
+    def by_name(self) -> dict:
+        if self._by_name is None:
+            self._by_name = self._index('name')
+        return self._by_name
+
+    def _index(self, key: str) -> dict:
+        params = self.params if self.last else reversed(self.params)
+        return {param[key]: param for param in params if key in param}
+
+    def get(self, param_id: str) -> dict:
+        return self.by_id.get(param_id, {})
+
+    def get_by_name(self, name: str) -> dict:
+        return self.by_name.get(name, {})
+
+    def value(self, param_id: str) -> str:
+        return self.get(param_id).get('value', '-')
+
+    def value_by_name(self, name: str) -> str:
+        return self.get_by_name(name).get('value', '-')
+
+
+def get_param_index(params) -> ParamIndex:
+    return params if isinstance(params, ParamIndex) else ParamIndex(params)
+
+
+def get_param_value_by_name(params, value: str) -> str:
+    """
+    :param params: list of params or a ParamIndex built from them
+    :param value: name of the param
+    :return: value of the first param with that name or '-'
+    """
+    return get_param_index(params).value_by_name(value)
+
+
+def get_param_value(params, value: str) -> str:
+    """
+    :param params: list of params or a ParamIndex built from them
+    :param value: id of the param
+    :return: value of the first param with that id or '-'
+    """
+    return get_param_index(params).value(value)
+
+
+def chunks(iterable, size: int):
+    """
+    Splits iterable in lists of at most size elements, keeping the order
+
+    :type size: int
+    :param iterable: any iterable, it is consumed lazily
+    :param size: max number of elements per chunk
+    :return: generator of lists
+    """
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CommitmentFilter:
+    """
+    Filter of the 3yc reports, which only keep the assets and requests whose commitment_status
+    param has a value. It is applied to the documents as they are read, before any pricing or
+    subscription is fetched for them.
+
+    :param get_params: function returning the params of a document, e.g. of its asset
+    :param enabled: whether the filter applies, otherwise every document is kept
+    :param get_value: function of the params and a key returning the value of commitment_status,
+                      the asset reports look it up by name and the requests report by id
+    """
+
+    def __init__(self, get_params, enabled: bool = True, get_value=None):
+        self.get_params = get_params
+        self.enabled = enabled
+        self.get_value = get_value or get_param_value_by_name
+        # documents left out so far
+        self.skipped = 0
+        self._tracer = trace.get_tracer()
+
+    @classmethod
+    def for_parameters(cls, parameters: dict, get_params, get_value=None):
+        """
+        :param parameters: report parameters, the filter applies if commitment_status is 3yc
+        """
+        return cls(get_params, parameters.get('commitment_status') == '3yc', get_value)
+
+    def keeps(self, document: dict) -> bool:
+        commitment = self.get_value(self.get_params(document), 'commitment_status')
+        self._tracer.trace(document['id'], 'commitment status %r', commitment)
+        return commitment != '-' and commitment != ''
+
+    def __call__(self, documents):
+        """
+        :param documents: iterable with assets or requests
+        :return: generator with the documents kept
+        """
+        if not self.enabled:
+            yield from documents
+            return
+        for document in documents:
+            if self.keeps(document):
+                yield document
+            else:
+                self.skipped += 1
 
 
 def get_basic_value(base, value):
@@ -48,71 +174,119 @@ def convert_to_datetime(param_value):
     if param_value == "" or param_value == "-" or param_value is None:
         return "-"
 
-    return datetime.strptime(
-        param_value.replace("T", " ").replace("+00:00", ""),
-        "%Y-%m-%d %H:%M:%S",
-    )
+    return parse_datetime(param_value)
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parses the ISO-8601 timestamps of Connect, e.g. 2024-01-31T10:20:30+00:00, with Z, a space
+    instead of T, fractions of second or any offset as well
+
+    :type value: str
+    :param value: timestamp
+    :return: naive datetime in UTC, to the second
+    """
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if parsed.microsecond:
+        parsed = parsed.replace(microsecond=0)
+    return parsed
 
 
 def today() -> datetime:
     return datetime.datetime.today()
 
 
-def today_str() -> str:
-    return datetime.today().strftime('%Y-%m-%d %H:%M:%S')
+def compile_header(header: str):
+    """
+    :param header: asset header, a top level field, a split header like 'reseller-id' or
+                   'contact'
+    :return: function of an asset returning the value of the header
+    """
+    if '-' in header:
+        return path_accessor(get_split_header_path(header))
+    if header == 'contact':
+        return get_contact
+    return _key_accessor(header)
 
 
-def process_asset_headers(asset, asset_headers) -> dict:
+def path_accessor(path: tuple):
     """
-    This function takes an asset and asset_headers to reach values in asset for
-    each key at asset_headers
-
-    :type asset: dict
-    :type asset_headers: list
-    :param asset: one asset from requested assets
-    :param asset_headers: headers to use as keys
-    :return: dict with values from asset and keys from headers
+    :param path: keys to follow from the object
+    :return: function of an object returning the value at path, '-' if any key is missing
     """
-    params = dict.fromkeys(asset_headers)
-    for header in asset_headers:
-        if '-' in header:
-            params[header] = get_value_from_split_header(asset, header)
-        elif header == 'contact':
-            params[header] = get_contact(asset)
-        else:
-            if header in asset:
-                params[header] = asset[header]
-            else:
-                params[header] = '-'
+    # the paths of the reports are short, they are unrolled up to four keys
+    if len(path) == 1:
+        first, = path
+
+        def accessor(value):
+            try:
+                return value[first]
+            except Exception:
+                return '-'
+    elif len(path) == 2:
+        first, second = path
+
+        def accessor(value):
+            try:
+                return value[first][second]
+            except Exception:
+                return '-'
+    elif len(path) == 3:
+        first, second, third = path
+
+        def accessor(value):
+            try:
+                return value[first][second][third]
+            except Exception:
+                return '-'
+    elif len(path) == 4:
+        first, second, third, fourth = path
+
+        def accessor(value):
+            try:
+                return value[first][second][third][fourth]
+            except Exception:
+                return '-'
+    else:
+        def accessor(value):
+            try:
+                for key in path:
+                    value = value[key]
+                return value
+            except Exception:
+                return '-'
+    return accessor
 
-    return params
 
+def _key_accessor(key: str):
+    def accessor(asset):
+        return asset[key] if key in asset else '-'
+    return accessor
 
-def process_asset_parameters_by_name(asset_params: list, asset_parameters: list) -> dict:
+
+def get_asset_fields(asset_headers: list) -> set:
     """
-    This function takes asset_params and asset_parameters(headers) to reach values in asset_params for
-    each key at asset_parameters
-
-    :type asset_params: list
-    :type asset_parameters: list
-    :param asset_params: requested asset['params'] from connect
-    :param asset_parameters: headers with keys to build the dict and reach the values
-    :return: dict with values from asset_params and keys from asset_parameters
+    This function returns the top level asset fields that compile_header reads to build
+    the values for asset_headers
+
+    :type asset_headers: list
+    :param asset_headers: headers used as keys
+    :return: set with asset fields
     """
-    params_dict = dict.fromkeys(asset_parameters)
-    handlers = {
-        'discount_group': lambda param: get_discount_level(param['value']),
-        'auto_renewal_status': lambda param: get_auto_renewal_status(param['value']),
-        'cb_price_level_hint_final_object': lambda param: get_hvd_code(param)
-    }
-    for param in asset_params:
-        param_id = param['name']
-        if param_id in asset_parameters:
-            if param_id in handlers:
-                params_dict[param_id] = handlers[param_id](param)
-            else:
-                params_dict[param_id] = param.get('value','')
-    return params_dict
+    fields = set()
+    for header in asset_headers:
+        if header == 'contact':
+            fields.add('tiers')
+        elif '-' in header:
+            fields.add(get_split_header_path(header)[0])
+        else:
+            fields.add(header)
+    return fields
+
 
 def get_hvd_code(param):
     items = (
@@ -154,8 +328,13 @@ def get_auto_renewal_status(value: str):
     else:
         return 'Empty'
 
-def handle_renewal_date(asset_creation_date: str) -> date:
-    return calculate_renewal_date(asset_creation_date, datetime.now(timezone.utc).date())
+# functions of the asset params whose value in the reports is not the raw one, by name
+ASSET_PARAM_HANDLERS = {
+    'discount_group': lambda param: get_discount_level(param['value']),
+    'auto_renewal_status': lambda param: get_auto_renewal_status(param['value']),
+    'cb_price_level_hint_final_object': lambda param: get_hvd_code(param),
+}
+
 
 def calculate_renewal_date(asset_creation_date: str, current_date: date) -> date:
     date = datetime.fromisoformat(asset_creation_date).date()
@@ -174,6 +353,21 @@ def resolve_leap_year_renewal_date(original_date: date, target_year: int) -> dat
     return original_date.replace(year=target_year)
 
 
+def get_split_header_path(header: str) -> tuple:
+    """
+    This function gets the header with '-' format and returns the keys to follow in the asset to
+    reach its value
+    example: product-id -> (product, id), reseller-name -> (tiers, tier1, name)
+
+    :type header: str
+    :param header: str from headers
+    :return: tuple with keys
+    """
+    h0 = header.split('-')[0]
+    h1 = header.split('-')[1]
+    return SPLIT_HEADER_PATHS.get(h0, (h0,)) + (h1,)
+
+
 def get_value_from_split_header(asset: dict, header: str) -> str:
     """
     This function gets the header with '-' format and split it to reach the value in asset
@@ -185,22 +379,7 @@ def get_value_from_split_header(asset: dict, header: str) -> str:
     :param header: str from headers
     :return: str with value from asset
     """
-    try:
-        h0 = header.split('-')[0]
-        h1 = header.split('-')[1]
-        if h0 == 'created':
-            value = asset['events'][h0][h1]
-        elif h0 == 'provider':
-            value = asset['connection'][h0][h1]
-        elif h0 in ['customer', 'reseller']:
-            if h0 == 'reseller':
-                h0 = 'tier1'
-            value = asset['tiers'][h0][h1]
-        else:
-            value = asset[h0][h1]
-        return value
-    except Exception:
-        return '-'
+    return path_accessor(get_split_header_path(header))(asset)
 
 
 def get_discount_level(discount_group: str) -> str:
@@ -223,90 +402,37 @@ def get_discount_level(discount_group: str) -> str:
     return discount
 
 
-def get_financials_from_price_list(price_list_points: list) -> dict:
+def get_financials_from_price_list(price_list_points) -> PriceTable:
     """
     This function retrieves the cost, reseller_cost and msrp from each point at the price list points
 
-    :type price_list_points: list
-    :param price_list_points: request with points of price list
-    :return: dict with cost, reseller_cost and msrp
+    :param price_list_points: iterable with points of price list, read once
+    :return: PriceTable with cost, reseller_cost and msrp per item global_id
     """
-    items_financials = {}
-    for point in price_list_points:
-        items_financials[point['item']['global_id']] = {} if point['item']['global_id'] not in items_financials \
-            else point['item']['global_id']
-        if float(point['attributes']['price']) != 0.0:
-            items_financials[point['item']['global_id']]['cost'] = \
-                float(point['attributes']['price'])
-
-            items_financials[point['item']['global_id']]['reseller_cost'] = \
-                float(point['attributes']['st0p']) if 'st0p' in point['attributes'] else 0.0
+    return PriceTable.from_points(price_list_points)
 
-            items_financials[point['item']['global_id']]['msrp'] = \
-                float(point['attributes']['st1p']) if 'st1p' in point['attributes'] else 0.0
-    return items_financials
 
-
-def get_currency_and_change(price_list_version: dict) -> dict:
+def get_currency_and_change(price_list_version: dict, rate_provider=None) -> dict:
     """
     Use the price list version to retrieve the currency and change from this currency to dollars in case
     of api fail the change will be 0 so the USD columns will be 0
 
     :type price_list_version: dict
+    :type rate_provider: reports.forex.RateProvider
     :param price_list_version: request with price list version
+    :param rate_provider: source of the changes, the process wide forex provider if not given
     :return: dict containing currency acronym and currency change
     """
     currency = {'currency': price_list_version['pricelist']['currency']}
     if currency['currency'] != BASE_CURRENCY:
-        exchange_response = api_calls.request_get(FOREXAPI_URL)
-        if exchange_response.status_code == 200:
-            currency['change'] = exchange_response.json()['rates'][BASE_CURRENCY]
-        else:
-            currency['change'] = 0.0
+        rate_provider = rate_provider or forex.get_default_provider()
+        currency['change'] = rate_provider.get_change(currency['currency'])
     else:
         currency['change'] = 1.0
 
     return currency
 
 
-def get_financials_and_seats(items: list, price_list_financials: dict) -> dict:
-    """
-    This function takes items and price list for those items to return a dict with values if they
-    exits at items and all financials added from each item
-
-    :type price_list_financials: dict
-    :type items: list
-    :param items: list with items from request
-    :param price_list_financials: dict with cost, reseller_cost and msrp for each item[global_id]
-    :return: dict
-    """
-    asset_financials = {}
-    asset_type = None
-    seats = cost = reseller_cost = msrp = 0.0
-    for item in items:
-        item_quantity = int(item['quantity'])
-        if 'Enterprise' in item['display_name'] and not asset_type:
-            asset_type = 'enterprise'
-        elif 'Enterprise' in item['display_name'] and asset_type == 'team':
-            asset_type = 'both'
-        else:
-            asset_type = 'team'
-        if item_quantity > 0:
-            seats = seats + item_quantity
-            if price_list_financials and item['global_id'] in price_list_financials:
-                cost = cost + item_quantity * price_list_financials[item['global_id']]['cost']
-                reseller_cost = reseller_cost + item_quantity * price_list_financials[item['global_id']][
-                    'reseller_cost']
-                msrp = msrp + item_quantity * price_list_financials[item['global_id']]['msrp']
-
-    asset_financials['purchase_type'] = asset_type
-    asset_financials['cost'] = cost
-    asset_financials['reseller_cost'] = reseller_cost
-    asset_financials['msrp'] = msrp
-    asset_financials['seats'] = seats
-    return asset_financials
-
-
 def get_base_currency_financials(financials_and_seats: dict, currency: dict) -> dict:
     """
     This function returns the value in dollars for the current cost, reseller_cost and msrp
@@ -321,15 +447,3 @@ def get_base_currency_financials(financials_and_seats: dict, currency: dict) ->
         'USD-cost': '{:0.2f}'.format(financials_and_seats['cost'] * currency['change']),
         'USD-reseller_cost': '{:0.2f}'.format(financials_and_seats['reseller_cost'] * currency['change']),
         'USD-msrp': '{:0.2f}'.format(financials_and_seats['msrp'] * currency['change'])}
-
-
-def get_financials_from_product_per_marketplace(client, marketplace_id, asset_id):
-    listing = api_calls.request_listing(client, marketplace_id, asset_id)
-    price_list_points = []
-    try:
-        if listing and listing['pricelist']:
-            price_list_version = api_calls.request_price_list(client, listing['pricelist']['id'])
-            price_list_points = api_calls.request_price_list_version_points(client, price_list_version['id'])
-    except:
-        return {}
-    return get_financials_from_price_list(price_list_points)
@@ -3,10 +3,11 @@
 # Copyright (c) 2024, Elena Klokova
 # All rights reserved.
 #
+import json
 from collections import namedtuple
 from collections.abc import Iterable
 from types import MethodType
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 import requests
@@ -193,3 +194,35 @@ def sync_client_factory():
         client._execute_http_call = MethodType(_execute_http_call, client)
         return client
     return _create_client
+
+
+@pytest.fixture
+def synthetic_client_factory():
+    """
+    Client answered by a tests.synthetic.SyntheticConnect instead of a list of responses, for
+    runs with too many calls to be listed
+    """
+    def _create_client(connect):
+        client = ConnectClient('Key', use_specs=False)
+        prefix = urlsplit(client.endpoint).path.rstrip('/')
+
+        def _execute_http_call(self, method, url, kwargs):
+            parts = urlsplit(url)
+            status, body, content_range = connect.handle(
+                method, parts.path[len(prefix):], parts.query, kwargs.get('params'),
+            )
+            response = requests.Response()
+            response.status_code = status
+            response.url = url
+            response._content = json.dumps(body).encode()
+            response.headers['Content-Type'] = 'application/json'
+            if content_range:
+                response.headers['Content-Range'] = content_range
+            self.response = response
+
+            if self.response.status_code >= 400:
+                self.response.raise_for_status()
+
+        client._execute_http_call = MethodType(_execute_http_call, client)
+        return client
+    return _create_client
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Local HTTP stand-in of the Connect API and of the forex API, for end-to-end load tests.
+
+StandIn serves the subscriptions/assets, requests, listings and pricing endpoints of a
+SyntheticConnect, with its RQL filters and pagination, and FOREX_RATES at /forex/latest, from a
+threaded HTTP server. Every call can be delayed, failed with a 503 at a given rate and limited
+to a number of calls per second, answered with 429 above it, so throughput and concurrency can be
+measured on a laptop against a realistic API:
+
+    python -m tests.stand_in --assets 50000 --latency-ms 40 --error-rate 0.01 --rate-limit 50
+
+and then generate the reports with
+
+    ConnectClient('ApiKey SU-000:0000', endpoint='http://127.0.0.1:8000/public/v1', use_specs=False)
+    REPORTS_FOREX_URL=http://127.0.0.1:8000/forex/latest
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from tests.synthetic import SyntheticConnect, forex_payload
+
+API_PREFIX = '/public/v1'
+FOREX_PATH = '/forex/latest'
+
+
+class Faults:
+    """
+    Latency, errors and rate limit injected in the calls, thread safe and seeded
+
+    :type latency: float
+    :type jitter: float
+    :type error_rate: float
+    :type rate_limit: int
+    :param latency: seconds every call is delayed
+    :param jitter: max seconds added at random to latency
+    :param error_rate: share of the calls answered with a 503
+    :param rate_limit: calls per second answered before the next ones get a 429, 0 for no limit
+    :param seed: seed of the latency and errors
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit)
+        self._refilled_at = time.monotonic()
+
+    def delay(self) -> float:
+        with self._lock:
+            if not self.jitter:
+                return self.latency
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def fails(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def throttled(self) -> bool:
+        """
+        Token bucket of rate_limit tokens refilled at rate_limit per second
+        """
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            refilled = (now - self._refilled_at) * self.rate_limit
+            self._tokens = min(self.rate_limit, self._tokens + refilled)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+
+class StandIn:
+    """
+    Threaded HTTP server answering Connect and forex API calls with the data of connect.
+
+    Use it as a context manager, or start() and stop() it. stats counts the calls per outcome
+    (served, failed, throttled) and max_in_flight is the most calls answered at the same time.
+
+    :type connect: SyntheticConnect
+    :type faults: Faults
+    :param connect: synthetic data to serve
+    :param faults: what to inject in the calls, nothing by default
+    :param host: host to listen at
+    :param port: port to listen at, any free one by default
+    """
+
+    def __init__(self, connect: SyntheticConnect, faults: Faults = None, host='127.0.0.1', port=0):
+        self.connect = connect
+        self.faults = faults or Faults()
+        self.stats = Counter()
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def endpoint(self) -> str:
+        """Endpoint to create the ConnectClient with"""
+        return self.url + API_PREFIX
+
+    @property
+    def forex_url(self) -> str:
+        """URL to set REPORTS_FOREX_URL to"""
+        return self.url + FOREX_PATH
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='stand-in', daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def answer(self, path: str, query_string: str) -> tuple:
+        """
+        :return: tuple with the status, the body as bytes and the headers of the answer
+        """
+        if self.faults.throttled():
+            return 429, _error('SYN_429', 'Too many requests'), {'Retry-After': '1'}
+        time.sleep(self.faults.delay())
+        if self.faults.fails():
+            return 503, _error('SYN_503', 'Service unavailable'), {}
+        if path == FOREX_PATH:
+            return 200, forex_payload(), {}
+        if not path.startswith(API_PREFIX + '/'):
+            return 404, _error('SYN_404', 'Not found'), {}
+        status, body, content_range = self.connect.handle(
+            'GET', path[len(API_PREFIX):], query_string,
+        )
+        headers = {'Content-Range': content_range} if content_range else {}
+        return status, json.dumps(body).encode(), headers
+
+    def _enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+    def _leave(self, status: int):
+        with self._lock:
+            self._in_flight -= 1
+            if status < 400:
+                self.stats['served'] += 1
+            else:
+                self.stats['throttled' if status == 429 else 'failed'] += 1
+
+
+def _error(code: str, message: str) -> bytes:
+    return json.dumps({'error_code': code, 'errors': [message]}).encode()
+
+
+def _handler(stand_in: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):  # noqa: N802
+            stand_in._enter()
+            status = 500
+            try:
+                parts = urlsplit(self.path)
+                status, body, headers = stand_in.answer(parts.path, parts.query)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                stand_in._leave(status)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--assets', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument(
+        '--rate-limit', type=int, default=0, help='calls per second, 0 for no limit',
+    )
+    args = parser.parse_args(argv)
+
+    connect = SyntheticConnect(assets=args.assets, requests=args.requests, seed=args.seed)
+    faults = Faults(
+        args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.rate_limit, args.seed,
+    )
+    stand_in = StandIn(connect, faults, args.host, args.port).start()
+    print('Connect endpoint: {}'.format(stand_in.endpoint), flush=True)
+    print('REPORTS_FOREX_URL={}'.format(stand_in.forex_url), flush=True)
+    print('Report parameters: {}'.format(json.dumps(connect.input_data())), flush=True)
+    try:
+        while True:
+            time.sleep(10)
+            print('calls: {} max in flight: {}'.format(
+                dict(stand_in.stats), stand_in.max_in_flight,
+            ), flush=True)
+    except KeyboardInterrupt:
+        stand_in.stop()
+
+
+if __name__ == '__main__':
+    main()
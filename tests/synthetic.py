@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+Synthetic Connect data for benchmarks and load tests.
+
+SyntheticConnect serves assets, approved requests, listings, price list versions and their
+points at any scale, generated on demand from their position so that even 500k assets take no
+memory, and answers the RQL queries and pagination produced by reports.api_calls.
+"""
+import json
+import math
+import random
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, unquote
+
+from reports.line_level_asset_report.entrypoint import asset_params_headers
+
+
+FOREX_RATES = {'base': 'EUR', 'rates': {'USD': 1.08, 'GBP': 0.86, 'EUR': 1.0}}
+
+# asset param filled with a structured value, see utils.get_hvd_code
+HVD_PARAM = 'cb_price_level_hint_final_object'
+
+
+class RQLSyntaxError(ValueError):
+    pass
+
+
+def parse_rql(text: str):
+    """
+    Parses an RQL expression like and(eq(status,approved),in(id,(A,B))) into nested tuples
+    (operator, arg, ...), where tuples of values are lists and values are strings
+    """
+    position = 0
+
+    def parse_node():
+        nonlocal position
+        if text.startswith('(', position):
+            position += 1
+            values = parse_arguments()
+            return list(values)
+        match = re.compile(r'[^(),]*').match(text, position)
+        token = match.group(0)
+        position = match.end()
+        if text.startswith('(', position):
+            position += 1
+            return (token,) + tuple(parse_arguments())
+        return token
+
+    def parse_arguments():
+        nonlocal position
+        arguments = []
+        while True:
+            if text.startswith(')', position):
+                position += 1
+                return arguments
+            arguments.append(parse_node())
+            if text.startswith(',', position):
+                position += 1
+            elif not text.startswith(')', position):
+                raise RQLSyntaxError('Unexpected end of RQL expression: {}'.format(text))
+
+    node = parse_node()
+    if position != len(text):
+        raise RQLSyntaxError('Unexpected text after RQL expression: {}'.format(text[position:]))
+    return node
+
+
+def resolve(item, field: str):
+    for key in field.split('.'):
+        if not isinstance(item, dict):
+            return None
+        item = item.get(key)
+    return item
+
+
+def evaluate(node, item) -> bool:
+    operator, *arguments = node
+    if operator == 'and':
+        return all(evaluate(argument, item) for argument in arguments)
+    if operator == 'or':
+        return any(evaluate(argument, item) for argument in arguments)
+    if operator == 'not':
+        return not evaluate(arguments[0], item)
+    value = resolve(item, arguments[0])
+    if operator in ('in', 'out'):
+        found = value is not None and str(value) in arguments[1]
+        return found if operator == 'in' else not found
+    if value is None:
+        return operator == 'ne'
+    value = str(value)
+    if operator == 'eq':
+        return value == arguments[1]
+    if operator == 'ne':
+        return value != arguments[1]
+    if operator in ('ge', 'gt', 'le', 'lt'):
+        return _compare(operator, _comparable(value), _comparable(arguments[1]))
+    if operator in ('like', 'ilike'):
+        pattern = '^' + re.escape(arguments[1]).replace(r'\*', '.*') + '$'
+        return re.match(pattern, value, re.IGNORECASE if operator == 'ilike' else 0) is not None
+    raise RQLSyntaxError('Unsupported RQL operator: {}'.format(operator))
+
+
+def _compare(operator: str, left, right) -> bool:
+    if operator == 'ge':
+        return left >= right
+    if operator == 'gt':
+        return left > right
+    if operator == 'le':
+        return left <= right
+    return left < right
+
+
+def _comparable(value: str):
+    """Dates compare as dates, naive ones being UTC like in Connect, anything else as text"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return value
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_query(query_string: str) -> dict:
+    """
+    Splits the query string of a Connect request in its RQL filter, select, ordering and
+    pagination params
+    """
+    query = {'filter': None, 'select': [], 'ordering': [], 'limit': None, 'offset': 0}
+    filters = []
+    for part in query_string.split('&') if query_string else []:
+        part = unquote(part)
+        if not part:
+            continue
+        if part.startswith('select('):
+            query['select'].extend(part[7:-1].split(','))
+        elif part.startswith('ordering('):
+            query['ordering'].extend(part[9:-1].split(','))
+        elif '(' not in part and '=' in part:
+            key, value = parse_qsl(part, keep_blank_values=True)[0]
+            if key in ('limit', 'offset'):
+                query[key] = int(value)
+        else:
+            filters.append(parse_rql(part))
+    if len(filters) == 1:
+        query['filter'] = filters[0]
+    elif filters:
+        query['filter'] = ('and',) + tuple(filters)
+    return query
+
+
+def project(item: dict, select: list) -> dict:
+    """Applies select(-field) exclusions, positive selections are expansions and are ignored"""
+    for field in select:
+        if field.startswith('-'):
+            item = _drop(item, field[1:].split('.'))
+    return item
+
+
+def _drop(item: dict, path: list) -> dict:
+    if not isinstance(item, dict) or path[0] not in item:
+        return item
+    item = dict(item)
+    if len(path) == 1:
+        del item[path[0]]
+    else:
+        item[path[0]] = _drop(item[path[0]], path[1:])
+    return item
+
+
+class SyntheticConnect:
+    """
+    Deterministic synthetic Connect account.
+
+    Assets are created every step from start, and so are approved requests, each one on asset
+    index % assets. Products and marketplaces are assigned round robin, a few marketplace and
+    product pairs have no price list and half of the price lists are in EUR. Calls can be
+    answered from several threads at once.
+
+    :param assets: number of assets
+    :param requests: number of approved requests, as many as assets by default
+    :param marketplaces: number of marketplaces
+    :param products: number of products
+    :param items_per_product: items of each product, each one has a price point
+    :param params_per_asset: params of each asset, the report ones plus filler params
+    :param seed: seed of the random values
+    """
+
+    def __init__(
+            self,
+            assets=1000,
+            requests=None,
+            marketplaces=3,
+            products=10,
+            items_per_product=20,
+            params_per_asset=40,
+            seed=0,
+            start=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            step=timedelta(minutes=1),
+    ):
+        self.assets = assets
+        self.requests = assets if requests is None else requests
+        self.marketplaces = marketplaces
+        self.products = products
+        self.items_per_product = items_per_product
+        self.params_per_asset = params_per_asset
+        self.seed = seed
+        self.start = start
+        self.step = step
+        self.calls = Counter()
+        self._matches = {}
+        # guards calls and _matches, the documents are built outside of it
+        self._lock = threading.Lock()
+
+    @property
+    def end(self) -> datetime:
+        return self.start + self.step * max(self.assets, self.requests)
+
+    def product_ids(self) -> list:
+        return ['PRD-{:03d}'.format(product) for product in range(self.products)]
+
+    def input_data(self) -> dict:
+        """Report parameters covering the whole account"""
+        return {
+            'date': {'after': _rql_date(self.start), 'before': _rql_date(self.end)},
+            'product': {'all': False, 'choices': self.product_ids()},
+            'status': {'all': True, 'choices': []},
+            'connection_type': {'all': True, 'choices': []},
+            'commitment_status': 'all assets',
+        }
+
+    def created(self, index: int) -> str:
+        return (self.start + self.step * index).isoformat()
+
+    def asset(self, index: int) -> dict:
+        rng = random.Random(self.seed * 1000003 + index)
+        product = index % self.products
+        marketplace = (index // self.products) % self.marketplaces
+        customer = 'TA-C-{:06d}'.format(index % 5000)
+        return {
+            'id': 'AS-{:07d}'.format(index),
+            'status': 'active',
+            'external_id': str(100000 + index),
+            'product': {'id': 'PRD-{:03d}'.format(product), 'name': 'Product {}'.format(product)},
+            'connection': {
+                'id': 'CT-{:03d}'.format(marketplace),
+                'type': 'production',
+                'provider': {'id': 'PA-001', 'name': 'Provider'},
+            },
+            'marketplace': {
+                'id': 'MP-{:03d}'.format(marketplace),
+                'name': 'Marketplace {}'.format(marketplace),
+            },
+            'contract': {
+                'id': 'CRD-{:03d}'.format(marketplace),
+                'name': 'Contract {}'.format(marketplace),
+            },
+            'events': {
+                'created': {'at': self.created(index)},
+                'updated': {'at': self.created(index)},
+            },
+            'tiers': {
+                'tier1': {
+                    'id': 'TA-R-{:04d}'.format(index % 300),
+                    'external_id': str(index % 300),
+                    'name': 'Reseller',
+                },
+                'customer': {
+                    'id': customer,
+                    'external_id': customer[5:],
+                    'name': 'Customer {}'.format(customer),
+                    'contact_info': {'contact': {
+                        'first_name': 'Jane', 'last_name': 'Doe', 'email': 'jane@example.com',
+                    }},
+                },
+            },
+            'params': self._params(rng, index),
+            'items': self._items(rng, product),
+            'configuration': {'params': [
+                {'id': 'Adobe_Currency', 'value': 'EUR' if marketplace % 2 else 'USD'},
+            ]},
+            'billing': {
+                'next_date': (self.start + timedelta(days=365 + index % 365)).date().isoformat(),
+            },
+        }
+
+    def request(self, index: int) -> dict:
+        asset = self.asset(index % self.assets)
+        for item in asset['items']:
+            item['old_quantity'] = str(max(0, int(item['quantity']) - 1 - index % 3))
+        return {
+            'id': 'PR-{:07d}'.format(index),
+            'type': 'purchase' if index % 4 else 'change',
+            'status': 'approved',
+            'created': self.created(index),
+            'updated': self.created(index),
+            'effective_date': self.created(index),
+            'assignee': {'id': 'UR-001'},
+            'marketplace': asset['marketplace'],
+            'asset': asset,
+        }
+
+    def listing(self, marketplace: int, product: int) -> dict:
+        listing = {
+            'id': 'LST-{:03d}-{:03d}'.format(marketplace, product),
+            'status': 'listed',
+            'marketplace': {'id': 'MP-{:03d}'.format(marketplace)},
+            'product': {'id': 'PRD-{:03d}'.format(product)},
+        }
+        if (marketplace + product) % 7 != 6:
+            listing['pricelist'] = {'id': 'PL-{:03d}-{:03d}'.format(marketplace, product)}
+        return listing
+
+    def price_list_version(self, marketplace: int, product: int) -> dict:
+        return {
+            'id': 'PLV-{:03d}-{:03d}'.format(marketplace, product),
+            'status': 'active',
+            'pricelist': {
+                'id': 'PL-{:03d}-{:03d}'.format(marketplace, product),
+                'currency': 'EUR' if marketplace % 2 else 'USD',
+            },
+        }
+
+    def price_points(self, marketplace: int, product: int) -> list:
+        rng = random.Random(self.seed * 7919 + marketplace * 1000 + product)
+        points = []
+        for item in range(self.items_per_product):
+            price = round(rng.uniform(10, 500), 2)
+            points.append({
+                'id': 'PP-{:03d}-{:03d}-{:04d}'.format(marketplace, product, item),
+                'status': 'filled',
+                'item': {'global_id': self._global_id(product, item)},
+                'attributes': {
+                    'price': str(price),
+                    'st0p': str(round(price * 0.9, 2)),
+                    'st1p': str(round(price * 1.2, 2)),
+                },
+            })
+        return points
+
+    def handle(self, method: str, path: str, query_string: str = '', params=None):
+        """
+        Answers a Connect API call
+
+        :param method: HTTP method, only GET is supported
+        :param path: path after the API endpoint, e.g. subscriptions/assets
+        :param query_string: RQL query string of the call
+        :param params: limit and offset, when not in the query string
+        :return: tuple with status, JSON body and Content-Range header or None
+        """
+        query = parse_query(query_string)
+        for key, value in (params or {}).items():
+            if key in ('limit', 'offset'):
+                query[key] = int(value)
+        path = path.strip('/')
+        with self._lock:
+            self.calls[_resource(path)] += 1
+        if method.upper() != 'GET':
+            return 405, {'error_code': 'SYN_001', 'errors': ['Method not allowed']}, None
+        if path == 'subscriptions/assets':
+            return self._collection(query, self.assets, self.asset, 'events.created.at')
+        if path == 'requests':
+            return self._collection(query, self.requests, self.request, 'created')
+        if path == 'listings':
+            return self._small_collection(query, [
+                self.listing(marketplace, product)
+                for marketplace in range(self.marketplaces) for product in range(self.products)
+            ])
+        if path == 'pricing/versions':
+            return self._small_collection(query, [
+                self.price_list_version(marketplace, product)
+                for marketplace in range(self.marketplaces) for product in range(self.products)
+                if 'pricelist' in self.listing(marketplace, product)
+            ])
+        match = re.fullmatch(r'pricing/versions/PLV-(\d+)-(\d+)/points', path)
+        if match:
+            points = self.price_points(int(match.group(1)), int(match.group(2)))
+            return self._small_collection(query, points)
+        return 404, {'error_code': 'SYN_002', 'errors': ['Not found: {}'.format(path)]}, None
+
+    def _small_collection(self, query: dict, items: list):
+        if query['filter']:
+            items = [item for item in items if evaluate(query['filter'], item)]
+        return self._page(query, len(items), lambda position: items[position])
+
+    def _collection(self, query: dict, size: int, factory, created_field: str):
+        """Collections ordered by creation date, created and id filters are solved by position"""
+        low, high, ids, rest = self._positions(query['filter'], size, created_field)
+        if ids is not None:
+            positions = sorted(position for position in ids if low <= position < high)
+            if rest:
+                positions = [
+                    position for position in positions if evaluate(rest, factory(position))
+                ]
+        elif rest:
+            key = (created_field, low, high, repr(rest))
+            with self._lock:
+                positions = self._matches.get(key)
+            if positions is None:
+                positions = [
+                    position for position in range(low, high) if evaluate(rest, factory(position))
+                ]
+                with self._lock:
+                    if len(self._matches) > 64:
+                        self._matches.clear()
+                    self._matches[key] = positions
+        else:
+            positions = range(low, high)
+        if query['ordering'] and query['ordering'][0].startswith('-'):
+            positions = positions[::-1]
+        return self._page(query, len(positions), lambda position: factory(positions[position]))
+
+    def _positions(self, node, size: int, created_field: str):
+        low, high, ids, rest = 0, size, None, []
+        predicates = list(node[1:]) if node and node[0] == 'and' else ([node] if node else [])
+        for predicate in predicates:
+            operator = predicate[0]
+            if operator in ('ge', 'gt', 'le', 'lt') and predicate[1] == created_field:
+                offset = (_comparable(predicate[2]) - self.start) / self.step
+                if operator == 'ge':
+                    low = max(low, math.ceil(offset))
+                elif operator == 'gt':
+                    low = max(low, math.floor(offset) + 1)
+                elif operator == 'le':
+                    high = min(high, math.floor(offset) + 1)
+                else:
+                    high = min(high, math.ceil(offset))
+            elif operator in ('eq', 'in') and predicate[1] == 'id':
+                values = predicate[2] if operator == 'in' else [predicate[2]]
+                found = {
+                    int(value.split('-')[-1])
+                    for value in values if re.fullmatch(r'[A-Z]+-\d+', value)
+                }
+                ids = found if ids is None else ids & found
+            else:
+                rest.append(predicate)
+        low, high = max(low, 0), min(high, size)
+        rest = ('and',) + tuple(rest) if len(rest) > 1 else (rest[0] if rest else None)
+        return low, max(low, high), ids, rest
+
+    def _page(self, query: dict, total: int, get_item):
+        limit = 100 if query['limit'] is None else query['limit']
+        offset = query['offset']
+        items = [
+            project(get_item(position), query['select'])
+            for position in range(offset, min(total, offset + limit))
+        ]
+        last = offset + len(items) - 1 if items else offset
+        return 200, items, 'items {}-{}/{}'.format(offset, max(offset, last), total)
+
+    def _params(self, rng: random.Random, index: int) -> list:
+        params = []
+        for name in asset_params_headers:
+            value = '{}-{}'.format(name, index)
+            if name == 'discount_group':
+                value = rng.choice(['01A12', '02A12', '11A12', '03012', ''])
+            elif name == 'commitment_status':
+                value = 'COMMITTED' if index % 5 == 0 else ''
+            elif name == 'auto_renewal_status':
+                value = rng.choice(
+                    ['active_auto_renewal_status', 'inactive_auto_renewal_status', ''],
+                )
+            elif name in ('renewal_date', 'commitment_start_date', 'commitment_end_date'):
+                value = '' if index % 3 else self.created(index)[:10]
+            param = {'id': name, 'name': name, 'value': value}
+            if name == HVD_PARAM:
+                param['structured_value'] = {
+                    'discount': {'items': [{'rating_attribute': 'HVD{}'.format(index % 4)}]},
+                }
+            params.append(param)
+        for filler in range(max(0, self.params_per_asset - len(params))):
+            params.append({
+                'id': 'param_{}'.format(filler),
+                'name': 'param_{}'.format(filler),
+                'value': str(rng.random()),
+                'description': 'Synthetic parameter {}'.format(filler),
+            })
+        rng.shuffle(params)
+        return params
+
+    def _items(self, rng: random.Random, product: int) -> list:
+        items = []
+        count = rng.randint(1, min(3, self.items_per_product))
+        for item in rng.sample(range(self.items_per_product), count):
+            items.append({
+                'id': 'PRD-{:03d}-{:04d}'.format(product, item),
+                'global_id': self._global_id(product, item),
+                'mpn': 'MPN{:03d}{:04d}'.format(product, item),
+                'display_name': '{} seat {}'.format('Enterprise' if item % 2 else 'Teams', item),
+                'item_type': 'PPU' if item % 10 == 9 else 'Reservation',
+                'period': 'yearly',
+                'quantity': str(rng.randint(0, 50)),
+            })
+        return items
+
+    @staticmethod
+    def _global_id(product: int, item: int) -> str:
+        return 'PRD-{:03d}-{:04d}'.format(product, item)
+
+
+def _rql_date(date: datetime) -> str:
+    return date.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _resource(path: str) -> str:
+    return re.sub(r'/PLV-[^/]+/', '/{id}/', path.strip('/'))
+
+
+def forex_payload() -> bytes:
+    return json.dumps(FOREX_RATES).encode()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from reports import api_calls
+
+
+def test_get_projection_keeps_needed_fields():
+    available = ('params', 'items', 'asset.params', 'asset.configuration', 'asset.billing')
+
+    projection = api_calls.get_projection(['items', 'asset.configuration.params'], available)
+
+    assert projection == ['-params', '-asset.params', '-asset.billing']
+
+
+def test_request_assets_by_ids_selects_fields(sync_client_factory, response_factory):
+    client = sync_client_factory([
+        response_factory(
+            query='in(id,(AS-1,AS-2))',
+            select=api_calls.get_projection(['id', 'billing'], api_calls.ASSET_FIELDS),
+            value=[{'id': 'AS-1', 'billing': {'next_date': '2025-01-10'}}],
+        ),
+    ])
+
+    assets = list(api_calls.request_assets_by_ids(client, ['AS-1', 'AS-2'], ['id', 'billing']))
+
+    assert assets == [{'id': 'AS-1', 'billing': {'next_date': '2025-01-10'}}]
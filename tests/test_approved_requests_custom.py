@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import copy
+
+import pytest
+
+from reports.approved_requests_custom.entrypoint import generate
+
+
+REQUEST = {
+    'id': 'PR-1',
+    'type': 'purchase',
+    'created': '2024-01-10T10:00:00+00:00',
+    'effective_date': '2024-01-10T10:00:00+00:00',
+    'assignee': {'id': 'UR-1'},
+    'marketplace': {'id': 'MP-1', 'name': 'Marketplace'},
+    'asset': {
+        'id': 'AS-1',
+        'external_id': 'EXT-1',
+        'status': 'active',
+        'product': {'id': 'PRD-1', 'name': 'Product'},
+        'marketplace': {'id': 'MP-1'},
+        'connection': {'type': 'production', 'provider': {'id': 'PA-1', 'name': 'Provider'}},
+        'tiers': {
+            'tier1': {'id': 'TA-1', 'name': 'Reseller'},
+            'customer': {'name': 'Customer', 'external_id': 'C-1'},
+        },
+        'configuration': {'params': [{'id': 'Adobe_Currency', 'value': 'USD'}]},
+        'params': [
+            {'id': 'adobe_vip_number', 'name': 'adobe_vip_number', 'value': 'VIP-1'},
+            {'id': 'discount_group', 'name': 'discount_group', 'value': '01A12'},
+            {'id': 'commitment_status', 'name': 'commitment_status', 'value': ''},
+        ],
+        'items': [
+            {
+                'global_id': 'PRD-1-0001', 'display_name': 'Seat', 'mpn': 'MPN-1',
+                'period': 'yearly', 'item_type': 'Reservation', 'quantity': '5',
+                'old_quantity': '2',
+            },
+        ],
+    },
+}
+
+
+def _request(request_id, asset_id, created='2024-01-10T10:00:00+00:00'):
+    request = copy.deepcopy(REQUEST)
+    request['id'] = request_id
+    request['asset']['id'] = asset_id
+    request['created'] = created
+    return request
+
+
+def _pricing_responses(response_factory):
+    return [
+        response_factory(value=[{'id': 'LST-1', 'pricelist': {'id': 'PL-1'}}]),
+        response_factory(value=[{'id': 'PLV-1', 'pricelist': {'currency': 'USD'}}]),
+        response_factory(value=[
+            {
+                'item': {'global_id': 'PRD-1-0001'},
+                'attributes': {'price': '10.0', 'st0p': '8.0', 'st1p': '12.0'},
+            },
+        ]),
+    ]
+
+
+@pytest.mark.parametrize('workers, processes', (('1', '0'), ('4', '0'), ('1', '2')))
+def test_generate_prefetches_subscriptions(
+    monkeypatch, workers, processes, progress, sync_client_factory, response_factory,
+):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', workers)
+    monkeypatch.setenv('REPORTS_PROCESSES', processes)
+    client = sync_client_factory([
+        response_factory(ordering=['created', 'id'], value=[
+            _request('PR-1', 'AS-1'), _request('PR-2', 'AS-2'), _request('PR-3', 'AS-1'),
+        ]),
+        response_factory(
+            query='in(id,(AS-1,AS-2))',
+            value=[{'id': 'AS-1', 'billing': {'next_date': '2025-01-10'}}],
+        ),
+    ] + _pricing_responses(response_factory))
+
+    input_data = {'date': {'after': '2024-01-01', 'before': '2024-02-01'}}
+
+    rows = list(generate(client, input_data, progress))
+
+    assert [row[0] for row in rows] == ['PR-1', 'PR-2', 'PR-3']
+    assert [row[26] for row in rows] == ['2025-01-10', '-', '2025-01-10']
+    assert rows[0][15] == '+3.0'
+    assert rows[0][32:35] == (10.0, 8.0, 12.0)
+    assert progress.call_count == 3
+
+
+def test_generate_incremental_queries_after_watermark(
+    monkeypatch, tmp_path, progress, sync_client_factory, response_factory,
+):
+    monkeypatch.setenv('REPORTS_INCREMENTAL_STORE', str(tmp_path / 'approved.sqlite'))
+    parameters = {'date': {'after': '2024-01-01T00:00:00', 'before': '2024-02-01T00:00:00'}}
+    first_run = sync_client_factory([
+        response_factory(value=[
+            _request('PR-1', 'AS-1', '2024-01-10T10:00:00+00:00'),
+            _request('PR-2', 'AS-1', '2024-01-20T10:00:00+00:00'),
+        ]),
+        response_factory(value=[{'id': 'AS-1', 'billing': {'next_date': '2025-01-10'}}]),
+    ] + _pricing_responses(response_factory))
+    second_run = sync_client_factory([
+        response_factory(
+            query=(
+                'and(eq(status,approved),ge(created,2024-01-20T10:00:00),'
+                'le(created,2024-02-01T00:00:00))'
+            ),
+            value=[
+                _request('PR-2', 'AS-1', '2024-01-20T10:00:00+00:00'),
+                _request('PR-3', 'AS-1', '2024-01-25T10:00:00+00:00'),
+            ],
+        ),
+        response_factory(value=[{'id': 'AS-1', 'billing': {'next_date': '2025-01-10'}}]),
+    ] + _pricing_responses(response_factory))
+
+    first_rows = list(generate(first_run, parameters, progress))
+    second_rows = list(generate(second_run, parameters, progress))
+
+    assert [row[0] for row in first_rows] == ['PR-1', 'PR-2']
+    assert [row[0] for row in second_rows] == ['PR-1', 'PR-2', 'PR-3']
+    assert [row[:36] for row in second_rows[:2]] == [row[:36] for row in first_rows]
+
+
+def test_checkpointed_run_reads_ahead_no_more_than_a_commit(
+    monkeypatch, tmp_path, progress, sync_client_factory, response_factory,
+):
+    monkeypatch.setenv('REPORTS_CHECKPOINT', str(tmp_path / 'checkpoint.sqlite'))
+    monkeypatch.setenv('REPORTS_CHECKPOINT_EVERY', '2')
+    client = sync_client_factory([
+        response_factory(value=[
+            _request('PR-1', 'AS-1'), _request('PR-2', 'AS-2'), _request('PR-3', 'AS-3'),
+        ]),
+        response_factory(query='in(id,(AS-1,AS-2))', value=[]),
+    ] + _pricing_responses(response_factory) + [
+        response_factory(query='in(id,(AS-3))', value=[]),
+    ])
+    parameters = {'date': {'after': '2024-01-01T00:00:00', 'before': '2024-02-01T00:00:00'}}
+
+    rows = list(generate(client, parameters, progress))
+
+    assert [row[0] for row in rows] == ['PR-1', 'PR-2', 'PR-3']
+
+
+def test_3yc_keeps_requests_by_the_id_of_the_commitment_param(
+    progress, sync_client_factory, response_factory,
+):
+    committed = _request('PR-1', 'AS-1')
+    committed['asset']['params'][2] = {
+        'id': 'commitment_status', 'name': 'Commitment Status', 'value': 'COMMITTED',
+    }
+    named_only = _request('PR-2', 'AS-2')
+    named_only['asset']['params'][2] = {
+        'id': 'commitment', 'name': 'commitment_status', 'value': 'COMMITTED',
+    }
+    client = sync_client_factory([
+        response_factory(value=[committed, named_only]),
+        response_factory(
+            query='in(id,(AS-1))',
+            value=[{'id': 'AS-1', 'billing': {'next_date': '2025-01-10'}}],
+        ),
+    ] + _pricing_responses(response_factory))
+    parameters = {
+        'date': {'after': '2024-01-01', 'before': '2024-02-01'}, 'commitment_status': '3yc',
+    }
+
+    rows = list(generate(client, parameters, progress))
+
+    assert [row[0] for row in rows] == ['PR-1']
+    assert rows[0][37] == 'COMMITTED'
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+"""
+End to end benchmark of the report entrypoints over a synthetic Connect account, along with the
+param lookups of utils.ParamIndex against the recursive lookup they replaced.
+
+Skipped unless REPORTS_BENCH_SCALE sets the number of assets and requests, so the default run
+only checks behavior. A quick run is at 1k; for real measurements use a larger scale, no
+coverage and write the results as JSON, e.g.:
+
+    REPORTS_BENCH_SCALE=1000 pytest --no-cov tests/test_benchmarks.py
+    REPORTS_BENCH_SCALE=100000 REPORTS_BENCH_OUTPUT=bench.json \
+        pytest --no-cov tests/test_benchmarks.py
+"""
+import json
+import os
+import platform
+import time
+import timeit
+import tracemalloc
+
+import pytest
+import responses
+
+from reports import forex
+from reports import utils
+from reports.approved_requests_custom.entrypoint import generate as approved_requests_generate
+from reports.line_level_asset_report.entrypoint import generate as line_level_generate
+from reports.settings import get_int
+from reports.subscriptions_report.entrypoint import generate as subscriptions_generate
+from tests.synthetic import SyntheticConnect, forex_payload
+from tests.test_params import LOOKUPS, _params, _recursive_get_param_value
+
+
+# assets and requests of the synthetic account, the benchmarks do not run without
+SCALE = get_int('REPORTS_BENCH_SCALE', 0)
+
+pytestmark = pytest.mark.skipif(not SCALE, reason='REPORTS_BENCH_SCALE is not set')
+
+REPORTS = {
+    'line_level_asset_report': line_level_generate,
+    'subscriptions_report': subscriptions_generate,
+    'approved_requests_custom': approved_requests_generate,
+}
+
+_results = {'reports': {}, 'param_lookups': {}}
+
+
+def _input_data(connect, report):
+    input_data = connect.input_data()
+    if report == 'approved_requests_custom':
+        input_data['product'] = {'all': True, 'choices': []}
+    return input_data
+
+
+def _run(synthetic_client_factory, connect, report, trace_memory):
+    connect.calls.clear()
+    client = synthetic_client_factory(connect)
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        rows = 0
+        rows_of_report = REPORTS[report](
+            client, _input_data(connect, report), lambda progress, total: None,
+        )
+        for _ in rows_of_report:
+            rows += 1
+        seconds = time.perf_counter() - started
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        forex_calls = len(rsps.calls)
+    return rows, seconds, sum(connect.calls.values()) + forex_calls, dict(connect.calls), peak
+
+
+@pytest.fixture(scope='module')
+def bench_results():
+    yield _results
+    output = os.environ.get('REPORTS_BENCH_OUTPUT')
+    if output and any(_results.values()):
+        with open(output, 'w') as results_file:
+            json.dump({
+                'scale': SCALE,
+                'python': platform.python_version(),
+                **_results,
+            }, results_file, indent=2)
+
+
+@pytest.mark.parametrize('report', list(REPORTS))
+def test_benchmark_report(synthetic_client_factory, bench_results, report, monkeypatch):
+    monkeypatch.delenv('REPORTS_RESPONSE_CACHE', raising=False)
+    monkeypatch.delenv('REPORTS_INCREMENTAL_STORE', raising=False)
+    connect = SyntheticConnect(assets=SCALE)
+
+    rows, seconds, api_calls, calls_per_resource, _ = _run(
+        synthetic_client_factory, connect, report, False,
+    )
+    # the memory is measured on a second run, tracing allocations slows the first one down
+    memory_rows, _, _, _, peak = _run(synthetic_client_factory, connect, report, True)
+
+    bench_results['reports'][report] = {
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds, 1),
+        'api_calls': api_calls,
+        'api_calls_per_row': round(api_calls / rows, 4),
+        'api_calls_per_resource': calls_per_resource,
+        'peak_memory_bytes': peak,
+    }
+
+    assert rows > 0
+    assert memory_rows == rows
+
+
+def test_benchmark_param_lookups(bench_results):
+    params = _params(200)
+
+    def indexed():
+        index = utils.ParamIndex(params)
+        return [index.value(param_id) for param_id in LOOKUPS]
+
+    def recursive():
+        return [_recursive_get_param_value(params, param_id) for param_id in LOOKUPS]
+
+    indexed_seconds = min(timeit.repeat(indexed, number=20, repeat=3)) / 20
+    recursive_seconds = min(timeit.repeat(recursive, number=20, repeat=3)) / 20
+    bench_results['param_lookups'] = {
+        'params': len(params),
+        'lookups': len(LOOKUPS),
+        'indexed_seconds': round(indexed_seconds, 6),
+        'recursive_seconds': round(recursive_seconds, 6),
+        'speedup': round(recursive_seconds / indexed_seconds, 1),
+    }
+
+    assert indexed() == recursive()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import os
+
+import pytest
+import responses
+from connect.client import ClientError
+
+from reports import forex
+from reports.approved_requests_custom import entrypoint as approved
+from reports.line_level_asset_report import entrypoint as line_level
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+class _FailingConnect(SyntheticConnect):
+    """SyntheticConnect failing once, on the fail_at-th call to path"""
+
+    def __init__(self, path, fail_at, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.fail_at = fail_at
+
+    def handle(self, method, path, query_string='', params=None):
+        if path.strip('/') == self.path and self.calls[self.path] + 1 == self.fail_at:
+            self.fail_at = None
+            self.calls[self.path] += 1
+            return 503, {'error_code': 'SYN_503', 'errors': ['Unavailable']}, None
+        return super().handle(method, path, query_string, params)
+
+
+def _rows(entrypoint, client, input_data, renderer_type='csv'):
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        rows = []
+        try:
+            generated = entrypoint.generate(
+                client, input_data, lambda progress, total: None, renderer_type,
+            )
+            for row in generated:
+                rows.append(row)
+        except ClientError:
+            return rows, False
+        return rows, True
+
+
+@pytest.fixture
+def small_pages(monkeypatch):
+    monkeypatch.setenv('REPORTS_PAGE_LIMIT', '50')
+    monkeypatch.setenv('REPORTS_MAX_PAGE_LIMIT', '50')
+    monkeypatch.setenv('REPORTS_CHECKPOINT_EVERY', '30')
+
+
+def test_line_level_run_resumes_where_it_failed(
+    synthetic_client_factory, monkeypatch, tmp_path, small_pages,
+):
+    monkeypatch.setenv('REPORTS_CHECKPOINT', str(tmp_path / 'reference.sqlite'))
+    reference = SyntheticConnect(assets=400)
+    expected, _ = _rows(line_level, synthetic_client_factory(reference), reference.input_data())
+
+    path = str(tmp_path / 'checkpoint.sqlite')
+    monkeypatch.setenv('REPORTS_CHECKPOINT', path)
+    connect = _FailingConnect('subscriptions/assets', 5, assets=400)
+    partial, completed = _rows(line_level, synthetic_client_factory(connect), connect.input_data())
+    assert not completed and 1 < len(partial) < len(expected)
+
+    connect.calls.clear()
+    rows, completed = _rows(line_level, synthetic_client_factory(connect), connect.input_data())
+
+    assert completed
+    assert rows == expected
+    # the assets saved are not queried again, nor the price lists already resolved
+    assert connect.calls['subscriptions/assets'] < reference.calls['subscriptions/assets']
+    assert connect.calls['listings'] < reference.calls['listings']
+    # a finished run is forgotten
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.rates.json')]
+    connect.calls.clear()
+    assert _rows(line_level, synthetic_client_factory(connect), connect.input_data())[0] == expected
+    assert connect.calls['subscriptions/assets'] == reference.calls['subscriptions/assets']
+
+
+def test_approved_requests_run_resumes_with_the_same_clock(
+    synthetic_client_factory, monkeypatch, tmp_path, small_pages,
+):
+    monkeypatch.delenv('REPORTS_INCREMENTAL_STORE', raising=False)
+    monkeypatch.setenv('REPORTS_CHECKPOINT', str(tmp_path / 'checkpoint.sqlite'))
+    connect = _FailingConnect('requests', 14, assets=300, requests=1200)
+    input_data = dict(connect.input_data(), product={'all': True, 'choices': []})
+    partial, completed = _rows(approved, synthetic_client_factory(connect), input_data, None)
+    assert not completed and partial
+
+    rows, completed = _rows(approved, synthetic_client_factory(connect), input_data, None)
+    monkeypatch.delenv('REPORTS_CHECKPOINT')
+    expected, _ = _rows(approved, synthetic_client_factory(connect), input_data, None)
+
+    column = approved.EXPORTED_AT_COLUMN
+    assert completed
+    assert [row[:column] + row[column + 1:] for row in rows] == [
+        row[:column] + row[column + 1:] for row in expected
+    ]
+    assert {row[column] for row in rows} == {partial[0][column]}
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from datetime import datetime, timezone
+
+import pytest
+import responses
+
+from reports import columns
+from reports import forex
+from reports import utils
+from reports.approved_requests_custom import entrypoint as approved
+from reports.line_level_asset_report import entrypoint as line_level
+from reports.run_context import RunContext
+from tests.synthetic import SyntheticConnect, forex_payload
+
+CONTEXT = RunContext(datetime(2025, 6, 1, 12, tzinfo=timezone.utc))
+
+DOCUMENT = {
+    'id': 'PR-1',
+    'asset': {'id': 'AS-1', 'tiers': {'tier1': {'name': 'Reseller'}}},
+    'params': [
+        {'id': 'p1', 'name': 'vip', 'value': 'first'},
+        {'id': 'p1', 'name': 'vip', 'value': 'second'},
+        {'id': 'p2', 'name': 'group'},
+    ],
+    'items': [
+        {'id': 'IT-1', 'quantity': '2'},
+        {'id': 'IT-2', 'quantity': '0'},
+        {'id': 'IT-3', 'quantity': '5'},
+    ],
+}
+
+
+def _quantity(item):
+    return '' if item['quantity'] == '0' else item['quantity']
+
+
+def test_sources_read_like_the_utils_helpers():
+    spec = columns.ColumnSpec([
+        columns.Column('id', columns.path('id')),
+        columns.Column('reseller', columns.path('asset', 'tiers', 'tier1', 'name')),
+        columns.Column('customer', columns.path('asset', 'tiers', 'customer', 'name')),
+        columns.Column('vip', columns.param('p1')),
+        columns.Column('missing', columns.param('p9')),
+        columns.Column('vip by name', columns.named_param('vip')),
+        columns.Column('group by name', columns.named_param('group')),
+        columns.Column('missing by name', columns.named_param('missing')),
+        columns.Column('upper', columns.computed(str.upper, columns.param('p1'))),
+    ])
+
+    rows = spec.compile()(DOCUMENT)
+
+    assert rows == [[
+        'PR-1', 'Reseller', '-',
+        utils.get_param_value(DOCUMENT['params'], 'p1'), '-',
+        'second', '', None,
+        'FIRST',
+    ]]
+    assert spec.requires == frozenset()
+
+
+def test_item_columns_are_filled_in_the_rows_of_the_document():
+    spec = columns.ColumnSpec([
+        columns.Column('id', columns.path('id')),
+        columns.Column('quantity', columns.computed(_quantity, columns.ITEM)),
+        columns.Column(
+            'exported', columns.computed(lambda context: context.exported_at, columns.CONTEXT),
+        ),
+        columns.Column(
+            'anniversary', columns.path('billing', 'next_date', of=columns.SUBSCRIPTION),
+        ),
+    ], items=lambda document: document['items'], skip_empty='quantity', row_type=tuple)
+    build = spec.compile(CONTEXT)
+
+    rows = build(DOCUMENT, subscription={'billing': {'next_date': '2025-01-01'}})
+
+    assert rows == [
+        ('PR-1', '2', CONTEXT.exported_at, '2025-01-01'),
+        ('PR-1', '5', CONTEXT.exported_at, '2025-01-01'),
+    ]
+    assert build(dict(DOCUMENT, items=[])) == []
+    assert spec.requires == {columns.SUBSCRIPTION}
+    assert spec.position('exported') == 2
+
+
+def test_merged_columns_follow_the_renderer():
+    spec = columns.ColumnSpec([
+        columns.Column('id', columns.path('id')),
+        columns.Column('seats', columns.path('seats')),
+        columns.merged(['currency', 'cost'], columns.PRICING),
+        columns.Column('item', columns.path('id', of=columns.ITEM)),
+    ], items=lambda document: document['items'], row_without_items=True)
+    pricing = {'cost': '1.00', 'seats': 4, 'currency': 'EUR'}
+    document = {'id': 'AS-1', 'items': [{'id': 'IT-1'}]}
+
+    assert spec.headers == ['id', 'seats', 'currency', 'cost', 'item']
+    assert spec.requires == {columns.PRICING}
+    assert spec.compile()(document, pricing=pricing) == [['AS-1', '-', 'EUR', '1.00', 'IT-1']]
+    assert spec.compile(headed=False)(document, pricing=pricing) == [
+        ['AS-1', 4, '1.00', 'EUR', 'IT-1'],
+    ]
+    assert spec.compile(headed=False)(dict(document, items=[])) == [['AS-1', '-', None, None]]
+
+
+def test_merged_columns_must_end_the_columns_of_the_document():
+    spec = columns.ColumnSpec([
+        columns.merged(['cost'], columns.PRICING),
+        columns.Column('id', columns.path('id')),
+    ])
+
+    assert spec.compile()({'id': 'AS-1'}, pricing={'cost': 1}) == [[1, 'AS-1']]
+    with pytest.raises(ValueError):
+        spec.compile(headed=False)
+
+
+def test_asset_columns_fall_back_to_the_renewal_date():
+    asset = SyntheticConnect(assets=1).asset(0)
+    asset['params'] = [param for param in asset['params'] if param['name'] != 'renewal_date']
+
+    spec = columns.ColumnSpec(columns.asset_columns(['id', 'created-at'], ['renewal_date']))
+
+    row, = spec.compile(CONTEXT)(asset)
+
+    assert row == [asset['id'], asset['events']['created']['at'], str(CONTEXT.renewal_date(row[1]))]
+    assert line_level.headers == (
+        line_level.asset_headers + line_level.asset_params_headers + line_level.marketplace_headers
+        + line_level.item_headers
+    )
+
+
+def test_approved_fetches_only_the_enrichments_of_its_columns(
+    synthetic_client_factory, monkeypatch,
+):
+    connect = SyntheticConnect(assets=50, requests=50)
+    input_data = dict(connect.input_data(), product={'all': True, 'choices': []})
+    monkeypatch.setattr(approved, 'column_spec', columns.ColumnSpec(
+        [
+            column for column in approved.column_spec.columns
+            if not column.source.inputs & set(columns.ENRICHMENTS)
+        ],
+        items=approved.column_spec.items,
+        skip_empty='Order Delta',
+        row_type=tuple,
+    ))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        rows = list(approved.generate(
+            synthetic_client_factory(connect), input_data, lambda *args: None,
+        ))
+
+    assert rows
+    assert set(connect.calls) == {'requests'}
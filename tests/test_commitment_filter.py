@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import responses
+
+from reports import financials
+from reports import forex
+from reports import utils
+from reports.approved_requests_custom import entrypoint as approved
+from reports.line_level_asset_report import entrypoint as line_level
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+def test_filter_keeps_documents_with_a_commitment():
+    documents = [
+        {'id': 'AS-1', 'params': [{'name': 'commitment_status', 'value': 'COMMITTED'}]},
+        {'id': 'AS-2', 'params': [{'name': 'commitment_status', 'value': ''}]},
+        {'id': 'AS-3', 'params': [{'name': 'commitment_status', 'value': '-'}]},
+        {'id': 'AS-4', 'params': []},
+    ]
+
+    def get_params(asset):
+        return asset['params']
+
+    commitment_filter = utils.CommitmentFilter.for_parameters(
+        {'commitment_status': '3yc'}, get_params,
+    )
+    no_filter = utils.CommitmentFilter.for_parameters(
+        {'commitment_status': 'all assets'}, get_params,
+    )
+
+    assert [document['id'] for document in commitment_filter(documents)] == ['AS-1']
+    assert commitment_filter.skipped == 3
+    assert list(no_filter(documents)) == documents
+
+
+def test_assets_left_out_are_not_priced(synthetic_client_factory, monkeypatch):
+    priced = []
+    get_marketplace_params = financials.get_marketplace_params
+
+    def spy(pricing, assets):
+        priced.extend(asset['id'] for asset in assets)
+        return get_marketplace_params(pricing, assets)
+
+    monkeypatch.setattr(financials, 'get_marketplace_params', spy)
+    connect = SyntheticConnect(assets=200)
+    progress = []
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        rows = list(line_level.generate(
+            synthetic_client_factory(connect),
+            dict(connect.input_data(), commitment_status='3yc'),
+            lambda *args: progress.append(args),
+            'jsonl',
+        ))
+
+    committed = ['AS-{:07d}'.format(index) for index in range(0, 200, 5)]
+    assert priced == committed
+    assert sorted({row['id'] for row in rows}) == committed
+    assert progress[-1] == (200, 200)
+
+
+def test_requests_left_out_fetch_no_subscription(synthetic_client_factory):
+    connect = SyntheticConnect(assets=200, requests=200)
+    input_data = dict(connect.input_data(), product={'all': True, 'choices': []})
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        all_rows = list(approved.generate(
+            synthetic_client_factory(connect), input_data, lambda *args: None,
+        ))
+        calls = connect.calls['subscriptions/assets']
+        connect.calls.clear()
+        rows = list(approved.generate(
+            synthetic_client_factory(connect),
+            dict(input_data, commitment_status='3yc'),
+            lambda *args: None,
+        ))
+
+    assert rows
+    assert all(row[37] not in ('', '-') for row in rows)
+    assert len(rows) < len(all_rows)
+    assert connect.calls['subscriptions/assets'] <= calls
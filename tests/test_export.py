@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import csv
+import gzip
+import json
+
+import pytest
+import responses
+
+from reports import export
+from reports import forex
+from reports.line_level_asset_report import entrypoint as line_level
+from reports.subscriptions_report import entrypoint as subscriptions
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+def _generate(entrypoint, client, connect, renderer_type, progress_callback=None):
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        yield from entrypoint.generate(
+            client,
+            connect.input_data(),
+            progress_callback or (lambda progress, total: None),
+            renderer_type,
+        )
+
+
+@pytest.mark.parametrize('entrypoint', (line_level, subscriptions))
+def test_csv_export_has_header_row_and_full_rows(synthetic_client_factory, tmp_path, entrypoint):
+    connect = SyntheticConnect(assets=250)
+    path = str(tmp_path / 'report.csv.gz')
+
+    client = synthetic_client_factory(connect)
+
+    written = export.write_rows(_generate(entrypoint, client, connect, 'csv'), path, 'csv')
+
+    with gzip.open(path, 'rt', newline='') as output:
+        rows = list(csv.reader(output))
+    assert len(rows) == written
+    assert rows[0] == entrypoint.headers
+    assert all(len(row) == len(entrypoint.headers) for row in rows)
+    assert rows[1][0] == 'AS-0000000'
+
+
+def test_reports_without_financials_are_not_priced(synthetic_client_factory):
+    connect = SyntheticConnect(assets=250)
+
+    rows = list(_generate(subscriptions, synthetic_client_factory(connect), connect, 'xlsx'))
+
+    assert len(rows) == 250
+    assert set(connect.calls) == {'subscriptions/assets'}
+
+
+def test_jsonl_export_is_keyed_by_header(synthetic_client_factory, tmp_path):
+    connect = SyntheticConnect(assets=50)
+    path = str(tmp_path / 'report.jsonl')
+
+    client = synthetic_client_factory(connect)
+
+    export.write_rows(_generate(line_level, client, connect, 'jsonl'), path, 'jsonl')
+
+    with open(path) as output:
+        rows = [json.loads(line) for line in output]
+    assert all(list(row) == line_level.headers for row in rows)
+    priced = [row for row in rows if row['USD-cost'] is not None]
+    assert priced
+    assert all(row['cost'] is not None and row['item-id'] for row in priced)
+
+
+def test_pages_are_not_kept_while_streaming(synthetic_client_factory):
+    connect = SyntheticConnect(assets=250)
+    client = synthetic_client_factory(connect)
+    appending = []
+
+    def progress(progress, total):
+        appending.append(client.resourceset_append)
+
+    rows = list(_generate(line_level, client, connect, 'csv', progress))
+
+    assert len(rows) > 250
+    assert appending and not any(appending)
+    assert client.resourceset_append is True
+
+
+def test_xlsx_rows_are_unchanged(synthetic_client_factory):
+    connect = SyntheticConnect(assets=20)
+
+    rows = list(_generate(line_level, synthetic_client_factory(connect), connect, 'xlsx'))
+
+    assert rows[0][0] == 'AS-0000000'
+    assert isinstance(rows[0], list)
+
+
+def test_write_rows_rejects_template_renderers(tmp_path):
+    with pytest.raises(ValueError):
+        export.write_rows([], str(tmp_path / 'report.xlsx'), 'xlsx')
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import csv
+
+import responses
+
+from reports import export
+from reports import fan_out
+from reports import forex
+from reports.line_level_asset_report import entrypoint as line_level
+from reports.subscriptions_report import entrypoint as subscriptions
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+def _generate(entrypoint, client, input_data, renderer_type):
+    return list(entrypoint.generate(
+        client, input_data, lambda progress, total: None, renderer_type,
+    ))
+
+
+def test_reports_match_their_own_generate_with_one_pass(synthetic_client_factory, tmp_path):
+    connect = SyntheticConnect(assets=120)
+    input_data = connect.input_data()
+    path = str(tmp_path / 'lines.csv')
+    subscription_rows = []
+    progress = []
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        expected_lines = _generate(line_level, synthetic_client_factory(connect), input_data, 'csv')
+        line_calls = sum(connect.calls.values())
+        connect.calls.clear()
+        expected_subscriptions = _generate(
+            subscriptions, synthetic_client_factory(connect), input_data, 'xlsx',
+        )
+        connect.calls.clear()
+
+        with export.row_writer(path, 'csv') as lines:
+            processed = fan_out.generate_all(synthetic_client_factory(connect), input_data, [
+                fan_out.Target(line_level, lines, 'csv'),
+                fan_out.Target(
+                    subscriptions, subscription_rows.append, 'xlsx',
+                    lambda *args: progress.append(args),
+                ),
+            ])
+
+    with open(path, newline='') as output:
+        rows = list(csv.reader(output))
+    assert processed == 120
+    assert rows == [
+        [str(value) if value is not None else '' for value in row] for row in expected_lines
+    ]
+    assert subscription_rows == expected_subscriptions
+    assert progress[-1] == (120, 120)
+    # the subscriptions report renders no financials, so the pass costs what the line level does
+    assert sum(connect.calls.values()) == line_calls
+
+
+def test_empty_assets_reach_every_sink(synthetic_client_factory):
+    connect = SyntheticConnect(assets=0)
+    lines, subscription_rows = [], []
+
+    fan_out.generate_all(synthetic_client_factory(connect), connect.input_data(), [
+        fan_out.Target(line_level, lines.append, 'csv'),
+        fan_out.Target(subscriptions, subscription_rows.append, 'xlsx'),
+    ])
+
+    assert lines == [line_level.headers]
+    assert subscription_rows == [export.EMPTY_ASSETS]
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import random
+
+import pytest
+
+from reports import financials
+from reports import utils
+from reports.forex import StaticRateProvider
+from reports.pricing import PriceList
+
+
+class _Pricing:
+    def __init__(self, price_lists):
+        self.price_lists = price_lists
+        self.rates = StaticRateProvider({'EUR': 1.1})
+
+    def get(self, marketplace_id, product_id):
+        return self.price_lists.get((marketplace_id, product_id))
+
+
+def _reference_marketplace_params(pricing, asset):
+    """Per asset computation the batches replace, kept as the reference of their results"""
+    price_list = pricing.get(asset['marketplace']['id'], asset['product']['id'])
+    if price_list:
+        try:
+            if price_list.table is None:
+                raise ValueError()
+            currency = utils.get_currency_and_change(price_list.version, pricing.rates)
+            financials_and_seats = _reference_financials_and_seats(asset['items'], price_list.table)
+            base_financials = utils.get_base_currency_financials(financials_and_seats, currency)
+            currency.pop('change')
+            currency.update(financials_and_seats)
+            currency.update(base_financials)
+            currency['cost'] = '{:0.2f}'.format(currency['cost'])
+            currency['reseller_cost'] = '{:0.2f}'.format(currency['reseller_cost'])
+            currency['msrp'] = '{:0.2f}'.format(currency['msrp'])
+            return currency
+        except:  # noqa: E722
+            return {'cost': "0.0", 'reseller_cost': "0.0", 'msrp': "0.0"}
+    return None
+
+
+def _reference_financials_and_seats(items, price_table):
+    """Per asset sums the batches replace"""
+    asset_type = None
+    seats = cost = reseller_cost = msrp = 0.0
+    for item in items:
+        item_quantity = int(item['quantity'])
+        if 'Enterprise' in item['display_name'] and not asset_type:
+            asset_type = 'enterprise'
+        elif 'Enterprise' in item['display_name'] and asset_type == 'team':
+            asset_type = 'both'
+        else:
+            asset_type = 'team'
+        if item_quantity > 0:
+            seats = seats + item_quantity
+            position = price_table.positions.get(item['global_id'])
+            if position is not None:
+                cost = cost + item_quantity * price_table.cost[position]
+                reseller_cost = reseller_cost + item_quantity * price_table.reseller_cost[position]
+                msrp = msrp + item_quantity * price_table.msrp[position]
+    return {
+        'purchase_type': asset_type, 'cost': cost, 'reseller_cost': reseller_cost, 'msrp': msrp,
+        'seats': seats,
+    }
+
+
+def _price_list(currency, points):
+    version = {'id': 'PLV-{}'.format(currency), 'pricelist': {'currency': currency}}
+    return PriceList(version, utils.get_financials_from_price_list(points))
+
+
+def _point(global_id, price):
+    return {
+        'item': {'global_id': global_id},
+        'attributes': {'price': str(price), 'st0p': str(price * 0.9), 'st1p': str(price * 1.3)},
+    }
+
+
+def _assets(count):
+    quantities = ['0', '1', '3', '17', '250']
+    rng = random.Random(4)
+    assets = []
+    for index in range(count):
+        items = [
+            {
+                'global_id': 'ITEM-{}'.format(rng.randint(0, 12)),
+                'display_name': rng.choice(['Enterprise seat', 'Teams seat']),
+                'quantity': rng.choice(quantities + ['x'] if index % 50 == 7 else quantities),
+            }
+            for _ in range(rng.randint(0, 4))
+        ]
+        assets.append({
+            'marketplace': {'id': rng.choice(['MP-1', 'MP-2', 'MP-3', 'MP-4', 'MP-5'])},
+            'product': {'id': 'PRD-1'},
+            'items': items,
+        })
+    return assets
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(financials, 'numpy', None)
+    elif financials.numpy is None:  # pragma: no cover
+        pytest.skip('numpy is not installed')
+    return request.param
+
+
+def test_batches_match_per_asset_params(backend):
+    prices = [0.01, 3.5, 12.99, 150.0, 0.0, 7.25, 1e6 / 3]
+    points = [_point('ITEM-{}'.format(i), prices[i % 7]) for i in range(10)]
+    pricing = _Pricing({
+        ('MP-1', 'PRD-1'): _price_list('EUR', [points[i] for i in range(10) if i != 4]),
+        # ITEM-4 has no price here, it only adds seats
+        ('MP-2', 'PRD-1'): _price_list('USD', points),
+        ('MP-3', 'PRD-1'): _price_list('EUR', []),
+        ('MP-4', 'PRD-1'): PriceList({'id': 'PLV-4', 'pricelist': {'currency': 'EUR'}}, None),
+    })
+    assets = _assets(500)
+
+    params = []
+    for batch in utils.chunks(assets, 64):
+        params.extend(financials.get_marketplace_params(pricing, batch))
+
+    assert params == [_reference_marketplace_params(pricing, asset) for asset in assets]
+    # no numpy scalars in the rows
+    assert {
+        type(value) for param in params if param and 'seats' in param for value in param.values()
+    } <= {str, float, type(None)}
+    assert sum(1 for param in params if param == financials.FALLBACK_PARAMS) > 0
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import json
+
+from reports import utils
+from reports.forex import FOREXAPI_URL, ForexRateProvider, StaticRateProvider
+
+
+def test_forex_provider_fetches_once(response):
+    response.add('GET', FOREXAPI_URL, json={'base': 'EUR', 'rates': {'USD': 1.2, 'GBP': 0.8}})
+    provider = ForexRateProvider()
+
+    changes = [
+        utils.get_currency_and_change({'pricelist': {'currency': 'EUR'}}, provider)['change']
+        for _ in range(1000)
+    ]
+
+    assert set(changes) == {1.2}
+    assert provider.get_change('GBP') == 1.2 / 0.8
+    assert provider.get_change('USD') == 1.0
+    assert len(response.calls) == 1
+
+
+def test_forex_provider_remembers_failure(response):
+    response.add('GET', FOREXAPI_URL, status=503)
+    provider = ForexRateProvider()
+
+    assert provider.get_change('EUR') == 0.0
+    assert provider.get_change('EUR') == 0.0
+    assert len(response.calls) == 1
+
+
+def test_forex_provider_snapshot(response, tmp_path):
+    snapshot = tmp_path / 'rates.json'
+    response.add('GET', FOREXAPI_URL, json={'base': 'EUR', 'rates': {'USD': 1.1}})
+    ForexRateProvider(snapshot_path=str(snapshot)).get_change('EUR')
+
+    offline = ForexRateProvider(snapshot_path=str(snapshot))
+
+    assert json.loads(snapshot.read_text())['rates'] == {'USD': 1.1}
+    assert offline.get_change('EUR') == 1.1
+    assert offline.fetches == 0
+    assert len(response.calls) == 1
+
+
+def test_static_provider():
+    provider = StaticRateProvider({'EUR': 1.5})
+
+    assert provider.get_change('EUR') == 1.5
+    assert provider.get_change('USD') == 1.0
+    assert provider.get_change('JPY') == 0.0
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import json
+
+import responses
+
+from reports import forex
+from reports import instrumentation
+from reports.line_level_asset_report.entrypoint import generate
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+def _run_report(client, connect):
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        return list(generate(client, connect.input_data(), lambda progress, total: None))
+
+
+def test_get_endpoint():
+    get_endpoint = instrumentation.get_endpoint
+
+    assert get_endpoint('pricing/versions/PLV-123-456-789/points?eq(status,filled)') == \
+        'pricing/versions/{id}/points'
+    assert get_endpoint('/subscriptions/assets') == 'subscriptions/assets'
+    assert get_endpoint('theforexapi.com/api/latest') == 'theforexapi.com/api/latest'
+
+
+def test_run_summary_per_endpoint(synthetic_client_factory, monkeypatch):
+    monkeypatch.delenv('REPORTS_RESPONSE_CACHE', raising=False)
+    monkeypatch.setenv('REPORTS_PAGE_TARGET_MS', '60000')
+    connect = SyntheticConnect(assets=250)
+    client = synthetic_client_factory(connect)
+    summaries = []
+    instrumentation.add_hook(summaries.append)
+    try:
+        _run_report(client, connect)
+    finally:
+        instrumentation.remove_hook(summaries.append)
+
+    summary, = summaries
+    endpoints = summary['endpoints']
+    assert summary['report'] == 'line_level_asset_report'
+    # a first page of 100 assets, which has the total, and a page of 200
+    assert endpoints['subscriptions/assets']['calls'] == 2
+    assert endpoints['subscriptions/assets']['pages'] == 2
+    assert endpoints['subscriptions/assets']['bytes'] > 0
+    assert endpoints['listings']['calls'] == connect.calls['listings']
+    points = 'pricing/versions/{id}/points'
+    assert endpoints[points]['calls'] == connect.calls[points]
+    assert endpoints['theforexapi.com/api/latest']['calls'] == 1
+    assert sum(endpoints['listings']['latency_ms'].values()) == endpoints['listings']['calls']
+    assert summary['calls'] == sum(connect.calls.values()) + 1
+    assert summary['functions']['request_listing'] == connect.calls['listings']
+    # the client is left as it was
+    assert '_execute_http_call' in vars(client)
+    assert client._execute_http_call.__name__ == '_execute_http_call'
+
+
+def test_response_cache_hits_are_recorded(synthetic_client_factory, monkeypatch, tmp_path):
+    monkeypatch.setenv('REPORTS_RESPONSE_CACHE', str(tmp_path / 'cache.sqlite'))
+    connect = SyntheticConnect(assets=100)
+    summaries = []
+    instrumentation.add_hook(summaries.append)
+    try:
+        _run_report(synthetic_client_factory(connect), connect)
+        _run_report(synthetic_client_factory(connect), connect)
+    finally:
+        instrumentation.remove_hook(summaries.append)
+
+    first, second = summaries
+    assert first['endpoints']['listings']['cache_hits'] == 0
+    assert second['endpoints']['listings']['cache_hits'] == first['endpoints']['listings']['calls']
+    assert second['endpoints']['listings']['calls'] == 0
+
+
+def test_summary_logged_when_enabled_by_env(synthetic_client_factory, monkeypatch, caplog):
+    monkeypatch.setenv('REPORTS_INSTRUMENTATION', '1')
+    connect = SyntheticConnect(assets=10)
+    with caplog.at_level('INFO', logger='reports.instrumentation'):
+        _run_report(synthetic_client_factory(connect), connect)
+
+    record, = caplog.records
+    assert json.loads(record.getMessage())['endpoints']['subscriptions/assets']['calls'] == 1
+
+
+def test_disabled_records_nothing(synthetic_client_factory, monkeypatch):
+    monkeypatch.delenv('REPORTS_INSTRUMENTATION', raising=False)
+    connect = SyntheticConnect(assets=10)
+    client = synthetic_client_factory(connect)
+    call = client._execute_http_call
+
+    with instrumentation.run('report', client):
+        assert client._execute_http_call is call
+        instrumentation.record_cache_hit('listings')
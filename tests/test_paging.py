@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import itertools
+
+from connect.client import R
+
+from reports import api_calls
+from reports import paging
+from tests.synthetic import SyntheticConnect
+
+
+def _assets(client, connect):
+    return api_calls.page_assets_with_env(client, connect.input_data())
+
+
+def test_count_comes_from_the_first_page(synthetic_client_factory, monkeypatch):
+    monkeypatch.setenv('REPORTS_PAGE_TARGET_MS', '60000')
+    monkeypatch.setenv('REPORTS_PAGE_MAX_BYTES', str(64 * 1024 * 1024))
+    connect = SyntheticConnect(assets=1000)
+    assets = _assets(synthetic_client_factory(connect), connect)
+
+    assert assets.count() == 1000
+    assert connect.calls['subscriptions/assets'] == 1
+    ids = [asset['id'] for asset in assets]
+
+    assert ids == [connect.asset(index)['id'] for index in range(1000)]
+    assert assets.limits == [100, 200, 400, 800]
+    assert connect.calls['subscriptions/assets'] == 4
+
+
+def test_slow_pages_shrink(synthetic_client_factory, monkeypatch):
+    clock = itertools.count(step=2.0)
+    monkeypatch.setattr(paging.time, 'perf_counter', lambda: next(clock))
+    connect = SyntheticConnect(assets=300)
+    assets = _assets(synthetic_client_factory(connect), connect)
+
+    assert len(list(assets)) == 300
+    # 2 seconds per page against a target of 1
+    assert assets.limits[:4] == [100, 50, 25, 12]
+    assert set(assets.limits[4:]) == {paging.MIN_LIMIT}
+
+
+def test_large_pages_shrink_to_max_bytes(synthetic_client_factory, monkeypatch):
+    monkeypatch.setenv('REPORTS_PAGE_TARGET_MS', '60000')
+    connect = SyntheticConnect(assets=500)
+    client = synthetic_client_factory(connect)
+    first_page = client.get('subscriptions/assets', params={'limit': 100, 'offset': 0})
+    monkeypatch.setenv('REPORTS_PAGE_MAX_BYTES', str(len(client.response.content) // 4))
+
+    assets = _assets(client, connect)
+
+    assert [asset['id'] for asset in assets] == [connect.asset(index)['id'] for index in range(500)]
+    assert len(first_page) == 100
+    assert all(limit <= 25 for limit in assets.limits[1:])
+
+
+def test_url_carries_the_select_query_and_ordering():
+    url = paging.get_url('requests', R().status.eq('approved'), ['-note'], ['created', 'id'])
+
+    assert url == 'requests?select(-note)&eq(status,approved)&ordering(created,id)'
+    assert paging.get_url('requests', R()) == 'requests'
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from reports import utils
+
+
+LOOKUPS = [
+    'adobe_vip_number', 'adobe_order_id', 'transfer_id', 'action_type', 'adobe_user_email',
+    'adobe_customer_id', 'discount_group', 'commitment_status', 'commitment_start_date',
+    'commitment_end_date', 'recommitment_status', 'recommitment_start_date',
+    'recommitment_end_date', 'external_reference_id', 'missing_param',
+]
+
+
+def _recursive_get_param_value(params, value):
+    """get_param_value as it was before ParamIndex, kept as the baseline of the benchmark"""
+    try:
+        if params[0]['id'] == value:
+            return params[0]['value']
+        if len(params) == 1:
+            return '-'
+        return _recursive_get_param_value(list(params[1:]), value)
+    except Exception:
+        return '-'
+
+
+def _params(count):
+    params = [
+        {'id': 'param_{}'.format(i), 'name': 'param_{}'.format(i), 'value': str(i)}
+        for i in range(count)
+    ]
+    for position, param_id in enumerate(LOOKUPS[:-1]):
+        params[count - 1 - position * 3] = {
+            'id': param_id, 'name': param_id, 'value': param_id.upper(),
+        }
+    return params
+
+
+def test_param_index_matches_recursive_lookup():
+    params = _params(200)
+    index = utils.ParamIndex(params)
+
+    for param_id in LOOKUPS + ['param_0', 'param_100']:
+        expected = _recursive_get_param_value(params, param_id)
+        assert index.value(param_id) == expected
+        assert utils.get_param_value(params, param_id) == expected
+        assert utils.get_param_value_by_name(params, param_id) == expected
+    assert utils.get_param_value([], 'adobe_vip_number') == '-'
+    assert utils.get_param_value([{'id': 'adobe_vip_number'}], 'adobe_vip_number') == '-'
+
+
+def test_param_index_does_not_hit_recursion_limit():
+    params = _params(5000)
+
+    assert utils.get_param_value(params, 'adobe_vip_number') == 'ADOBE_VIP_NUMBER'
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import random
+import threading
+import time
+
+from reports.pipeline import ordered_map
+
+
+def test_ordered_map_keeps_order_and_bounds_in_flight():
+    lock = threading.Lock()
+    state = {'consumed': 0, 'max_ahead': 0}
+
+    def source():
+        for element in range(200):
+            with lock:
+                state['max_ahead'] = max(state['max_ahead'], element - state['consumed'])
+            yield element
+
+    def slow_square(element):
+        time.sleep(random.random() / 1000)
+        return element * element
+
+    results = []
+    for result in ordered_map(slow_square, source(), workers=8, max_in_flight=16):
+        results.append(result)
+        with lock:
+            state['consumed'] += 1
+
+    assert results == [element * element for element in range(200)]
+    assert state['max_ahead'] <= 16
+
+
+def test_ordered_map_without_workers_runs_inline():
+    threads = set()
+
+    def record(element):
+        threads.add(threading.get_ident())
+        return element
+
+    assert list(ordered_map(record, range(5))) == list(range(5))
+    assert threads == {threading.get_ident()}
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import pickle
+
+from reports import api_calls
+from reports.price_table import PriceTable
+from reports.pricing import PricingCache
+
+
+def _price_points():
+    return [
+        {
+            'item': {'global_id': 'PRD-1-0001'},
+            'attributes': {'price': '10.0', 'st0p': '8.0', 'st1p': '12.0'},
+        },
+        {'item': {'global_id': 'PRD-1-0002'}, 'attributes': {'price': '0.0'}},
+    ]
+
+
+def test_pricing_cache_resolves_pair_once(sync_client_factory, response_factory):
+    client = sync_client_factory([
+        response_factory(value=[{'id': 'LST-1', 'pricelist': {'id': 'PL-1'}}]),
+        response_factory(value=[{'id': 'PLV-1', 'pricelist': {'currency': 'USD'}}]),
+        response_factory(value=_price_points()),
+    ])
+    pricing = PricingCache(client)
+
+    first = pricing.get('MP-1', 'PRD-1')
+    second = pricing.get('MP-1', 'PRD-1')
+
+    assert first is second
+    assert first.version['id'] == 'PLV-1'
+    assert [
+        first.table.get('PRD-1-0001', name) for name in ('cost', 'reseller_cost', 'msrp')
+    ] == [10.0, 8.0, 12.0]
+    assert 'PRD-1-0002' not in first.table
+    assert pricing.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+
+def test_pricing_cache_remembers_missing_listing(sync_client_factory, response_factory):
+    client = sync_client_factory([
+        response_factory(value=[]),
+    ])
+    pricing = PricingCache(client)
+
+    assert pricing.get('MP-1', 'PRD-1') is None
+    assert pricing.get_table('MP-1', 'PRD-1') is None
+    assert (pricing.hits, pricing.misses) == (1, 1)
+
+
+def test_price_table_keeps_last_priced_point_of_repeated_items():
+    def points():
+        yield {
+            'item': {'global_id': 'A'},
+            'attributes': {'price': '10.0', 'st0p': '8.0', 'st1p': '12.0'},
+        }
+        yield {'item': {'global_id': 'B'}, 'attributes': {'price': '0'}}
+        yield {'item': {'global_id': 'A'}, 'attributes': {'price': '11.0'}}
+        yield {'item': {'global_id': 'C'}, 'attributes': {'price': '5.0', 'st1p': '6.0'}}
+        yield {'item': {'global_id': 'C'}, 'attributes': {'price': '0.0'}}
+        yield {
+            'item': {'global_id': 'B'},
+            'attributes': {'price': '3.0', 'st0p': '2.0', 'st1p': '4.0'},
+        }
+
+    table = PriceTable.from_points(points())
+
+    assert (len(table), table.points) == (3, 6)
+    assert [table.get('A', name) for name in ('cost', 'reseller_cost', 'msrp')] == [11.0, 0.0, 0.0]
+    assert [table.get('B', name) for name in ('cost', 'reseller_cost', 'msrp')] == [3.0, 2.0, 4.0]
+    assert [table.get('C', name) for name in ('cost', 'reseller_cost', 'msrp')] == [5.0, 0.0, 6.0]
+    assert table.get('D', 'cost') == '-'
+
+
+def test_price_table_subset_pickles_only_its_items():
+    table = PriceTable.from_points(
+        {'item': {'global_id': 'ITEM-{}'.format(index)}, 'attributes': {'price': str(index + 1)}}
+        for index in range(1000)
+    )
+
+    subset = pickle.loads(pickle.dumps(table.subset(['ITEM-7', 'ITEM-3', 'ITEM-7', 'MISSING'])))
+
+    assert len(subset) == 2 and 'MISSING' not in subset
+    assert [subset.get(item, 'cost') for item in ('ITEM-7', 'ITEM-3', 'ITEM-1')] == [8.0, 4.0, '-']
+    assert len(pickle.dumps(subset)) * 20 < len(pickle.dumps(table))
+
+
+def test_price_list_points_are_streamed_without_response_cache(
+    sync_client_factory, response_factory, monkeypatch,
+):
+    monkeypatch.delenv('REPORTS_RESPONSE_CACHE', raising=False)
+    client = sync_client_factory([
+        response_factory(value=_price_points()),
+    ])
+
+    points = api_calls.request_price_list_version_points(client, 'PLV-1')
+
+    assert not isinstance(points, list)
+    assert len(PriceTable.from_points(points)) == 1
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from reports import api_calls
+from reports.response_cache import ResponseCache
+
+
+def test_response_cache_ttl(tmp_path, mocker):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), 1024 * 1024)
+    time = mocker.patch('reports.response_cache.time.time', return_value=1000.0)
+    cache.set('listings', 'listings?eq(id,LST-1)', {'id': 'LST-1'})
+    cache.set('price_list_points', 'pricing/versions/PLV-1/points', [{'id': 'PP-1'}])
+
+    time.return_value = 1000.0 + 24 * 3600
+
+    assert cache.get('listings?eq(id,LST-1)', 900) == (False, None)
+    assert cache.get('pricing/versions/PLV-1/points', None) == (True, [{'id': 'PP-1'}])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), 100)
+    cache.set('price_list_points', 'first', ['x' * 40])
+    cache.set('price_list_points', 'second', ['y' * 40])
+    cache.set('price_list_points', 'third', ['z' * 40])
+
+    assert cache.get('first')[0] is False
+    assert cache.get('third') == (True, ['z' * 40])
+
+
+def test_price_list_points_are_read_once(
+    monkeypatch, tmp_path, sync_client_factory, response_factory,
+):
+    monkeypatch.setenv('REPORTS_RESPONSE_CACHE', str(tmp_path / 'responses.sqlite'))
+    client = sync_client_factory([
+        response_factory(value=[{'id': 'PP-1'}]),
+    ])
+
+    first = api_calls.request_price_list_version_points(client, 'PLV-1')
+    second = api_calls.request_price_list_version_points(client, 'PLV-1')
+
+    assert first == second == [{'id': 'PP-1'}]
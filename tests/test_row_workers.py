@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import pytest
+import responses
+
+from reports import fan_out
+from reports import forex
+from reports import row_workers
+from reports.line_level_asset_report import entrypoint as line_level
+from reports.subscriptions_report import entrypoint as subscriptions
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+def _generate(entrypoint, client, connect, renderer_type):
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        return list(entrypoint.generate(
+            client, connect.input_data(), lambda progress, total: None, renderer_type,
+        ))
+
+
+@pytest.mark.parametrize(
+    'entrypoint, renderer_type', ((line_level, 'xlsx'), (subscriptions, 'jsonl')),
+)
+def test_rows_built_in_processes_match(
+    synthetic_client_factory, monkeypatch, entrypoint, renderer_type,
+):
+    connect = SyntheticConnect(assets=350)
+    monkeypatch.setenv('REPORTS_PROCESSES', '0')
+    expected = _generate(entrypoint, synthetic_client_factory(connect), connect, renderer_type)
+
+    monkeypatch.setenv('REPORTS_PROCESSES', '3')
+    rows = _generate(entrypoint, synthetic_client_factory(connect), connect, renderer_type)
+
+    assert rows == expected
+
+
+def test_fan_out_builds_rows_in_processes(synthetic_client_factory, monkeypatch):
+    connect = SyntheticConnect(assets=150)
+    monkeypatch.setenv('REPORTS_PROCESSES', '2')
+    lines = []
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        fan_out.generate_all(synthetic_client_factory(connect), connect.input_data(), [
+            fan_out.Target(line_level, lines.append, 'csv'),
+        ])
+
+    monkeypatch.setenv('REPORTS_PROCESSES', '0')
+    assert lines == _generate(line_level, synthetic_client_factory(connect), connect, 'csv')
+
+
+def _get_doubler(factor):
+    def build_rows(value):
+        return [value * factor] * (value % 3)
+    return build_rows
+
+
+def test_rows_per_element_keeps_order():
+    elements = [(value,) for value in range(1000)]
+
+    rows = list(row_workers.rows_per_element(iter(elements), _get_doubler, (2,), processes=4))
+
+    assert rows == [((value,), [value * 2] * (value % 3)) for value in range(1000)]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from datetime import datetime, timedelta
+
+from reports.sharding import Shard, ShardedAssets, _split
+
+
+INPUT_DATA = {
+    'date': {'after': '2024-01-01T00:00:00', 'before': '2024-01-04T00:00:00'},
+    'product': {'all': False, 'choices': ['PRD-1']},
+}
+
+
+def test_split_keeps_last_window_closed():
+    after = datetime(2024, 1, 1)
+    shards = _split(Shard(after, after + timedelta(days=3), True, 10), 3)
+
+    assert [(shard.after.day, shard.before.day, shard.last) for shard in shards] == [
+        (1, 2, False), (2, 3, False), (3, 4, True),
+    ]
+
+
+def test_sharded_windows_of_dates_with_offset_are_sent_in_utc(
+        sync_client_factory, response_factory,
+):
+    # the fake server parses the query string like Connect does, a raw '+' being read as a space
+    client = sync_client_factory([
+        response_factory(count=1),
+        response_factory(
+            query=(
+                'and(ge(events.created.at,2024-01-01T00:00:00),'
+                'le(events.created.at,2024-01-04T00:00:00),in(product.id,(PRD-1)))'
+            ),
+            value=[{'id': 'AS-1'}],
+        ),
+    ])
+    input_data = dict(
+        INPUT_DATA, date={'after': '2024-01-01T00:00:00Z', 'before': '2024-01-04T02:00:00+02:00'},
+    )
+
+    assets = ShardedAssets(client, input_data, shard_size=2)
+
+    assert [asset['id'] for asset in assets] == ['AS-1']
+
+
+def test_sharded_assets_split_by_counts(sync_client_factory, response_factory):
+    client = sync_client_factory([
+        response_factory(count=4),
+        response_factory(count=1),
+        response_factory(count=3),
+        response_factory(count=2),
+        response_factory(count=1),
+        response_factory(value=[{'id': 'AS-1'}]),
+        response_factory(
+            query=(
+                'and(ge(events.created.at,2024-01-02T12:00:00),'
+                'lt(events.created.at,2024-01-03T06:00:00),in(product.id,(PRD-1)))'
+            ),
+            ordering=['events.created.at', 'id'],
+            value=[{'id': 'AS-2'}, {'id': 'AS-3'}],
+        ),
+        response_factory(
+            query=(
+                'and(ge(events.created.at,2024-01-03T06:00:00),'
+                'le(events.created.at,2024-01-04T00:00:00),in(product.id,(PRD-1)))'
+            ),
+            value=[{'id': 'AS-4'}],
+        ),
+    ])
+    assets = ShardedAssets(client, INPUT_DATA, shard_size=2)
+
+    assert assets.count() == 4
+    assert [shard.size for shard in assets.shards()] == [1, 2, 1]
+    assert [asset['id'] for asset in assets] == ['AS-1', 'AS-2', 'AS-3', 'AS-4']
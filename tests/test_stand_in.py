@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import responses
+from connect.client import ClientError, ConnectClient
+
+from reports import forex
+from reports.line_level_asset_report.entrypoint import generate
+from tests.stand_in import Faults, StandIn
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+def _client(stand_in, max_retries=0):
+    return ConnectClient(
+        'ApiKey SU-000:0000', endpoint=stand_in.endpoint, use_specs=False, max_retries=max_retries,
+    )
+
+
+def test_report_over_http_matches_synthetic_client(synthetic_client_factory, monkeypatch):
+    monkeypatch.setenv('REPORTS_MAX_WORKERS', '4')
+    connect = SyntheticConnect(assets=300)
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+        expected = list(generate(
+            synthetic_client_factory(connect), connect.input_data(), lambda progress, total: None,
+        ))
+
+    with StandIn(SyntheticConnect(assets=300), Faults(latency=0.005)) as stand_in:
+        monkeypatch.setenv('REPORTS_FOREX_URL', stand_in.forex_url)
+        rows = list(generate(_client(stand_in), connect.input_data(), lambda progress, total: None))
+
+    assert rows == expected
+    assert stand_in.stats['served'] == sum(stand_in.connect.calls.values()) + 1
+    assert stand_in.max_in_flight > 1
+
+
+def test_errors_and_rate_limit_are_injected():
+    with StandIn(SyntheticConnect(assets=10), Faults(error_rate=1.0)) as stand_in:
+        with pytest.raises(ClientError) as error:
+            _client(stand_in)('subscriptions').assets.all().first()
+    assert error.value.status_code == 503
+
+    with StandIn(SyntheticConnect(assets=10), Faults(rate_limit=2)) as stand_in:
+        client = _client(stand_in)
+        assert client('subscriptions').assets.all().count() == 10
+        client('subscriptions').assets.all().count()
+        with pytest.raises(ClientError) as error:
+            client('subscriptions').assets.all().count()
+    assert error.value.status_code == 429
+    assert stand_in.stats == {'served': 2, 'throttled': 1}
+
+
+def test_calls_are_answered_from_several_threads_at_once():
+    connect = SyntheticConnect(assets=300)
+    query = 'eq(status,active)&limit=50'
+    expected = SyntheticConnect(assets=300).handle('GET', 'subscriptions/assets', query)
+
+    with ThreadPoolExecutor(8) as pool:
+        answers = list(pool.map(
+            lambda _: connect.handle('GET', 'subscriptions/assets', query), range(64),
+        ))
+
+    assert all(answer == expected for answer in answers)
+    assert connect.calls['subscriptions/assets'] == 64
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import responses
+
+from reports import forex
+from reports import trace
+from reports.subscriptions_report.entrypoint import generate
+from tests.synthetic import SyntheticConnect, forex_payload
+
+
+class _Unformattable:
+    def __repr__(self):
+        raise AssertionError('formatted while tracing is off')
+
+
+def _clear_env(monkeypatch):
+    for name in ('REPORTS_TRACE', 'REPORTS_TRACE_IDS', 'REPORTS_TRACE_SAMPLE'):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_tracing_is_off_by_default(monkeypatch, caplog):
+    _clear_env(monkeypatch)
+
+    tracer = trace.get_tracer()
+    with caplog.at_level('DEBUG', logger='reports.trace'):
+        tracer.trace('AS-1', 'items %r', _Unformattable())
+
+    assert tracer is trace.NULL_TRACER
+    assert not caplog.records
+
+
+def test_tracer_selects_ids_and_samples(monkeypatch):
+    _clear_env(monkeypatch)
+    monkeypatch.setenv('REPORTS_TRACE_IDS', 'AS-1, AS-2')
+    monkeypatch.setenv('REPORTS_TRACE_SAMPLE', '10')
+
+    tracer = trace.get_tracer()
+    sampled = [index for index in range(1000) if tracer.wants('AS-{:04d}'.format(index))]
+
+    assert tracer.wants('AS-1') and tracer.wants('AS-2')
+    assert 50 < len(sampled) < 150
+    again = trace.get_tracer()
+    assert sampled == [index for index in range(1000) if again.wants('AS-{:04d}'.format(index))]
+
+
+def test_subscriptions_report_traces_selected_assets_only(
+    synthetic_client_factory, monkeypatch, caplog, capsys,
+):
+    _clear_env(monkeypatch)
+    monkeypatch.setenv('REPORTS_TRACE_IDS', 'AS-0000003')
+    connect = SyntheticConnect(assets=20)
+    client = synthetic_client_factory(connect)
+
+    with caplog.at_level('DEBUG', logger='reports.trace'):
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add(responses.GET, forex.FOREXAPI_URL, body=forex_payload(), status=200)
+            rows = list(generate(client, connect.input_data(), lambda progress, total: None))
+
+    record, = caplog.records
+    assert len(rows) == 20
+    assert record.document_id == 'AS-0000003'
+    assert record.getMessage().startswith("AS-0000003: items [{'id': 'PRD-003-")
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, Elena Klokova
+# All rights reserved.
+#
+import json
+from datetime import date, datetime, timezone
+
+from reports import utils
+from reports.line_level_asset_report.entrypoint import asset_headers
+from reports.run_context import RunContext
+
+
+ASSET = {
+    'id': 'AS-1',
+    'status': 'active',
+    'product': {'id': 'PRD-1'},
+    'connection': {'provider': {'id': 'PA-1', 'name': 'Provider'}},
+    'marketplace': {'id': 'MP-1', 'name': 'Marketplace'},
+    'contract': None,
+    'events': {'created': {'at': '2024-01-10T10:00:00+00:00'}},
+    'tiers': {
+        'tier1': {'id': 'TA-1', 'name': 'Reseller'},
+        'customer': {
+            'id': 'TA-2', 'name': 'Customer', 'contact_info': {'contact': {'first_name': 'Jane'}},
+        },
+    },
+}
+
+
+def test_compile_header_reads_the_headers():
+    values = {
+        header: utils.compile_header(header)(ASSET)
+        for header in asset_headers + ['contact', 'missing']
+    }
+
+    assert values['id'] == 'AS-1'
+    assert values['external_id'] == '-'
+    assert values['provider-name'] == 'Provider'
+    assert values['contract-id'] == '-'
+    assert values['reseller-name'] == 'Reseller'
+    assert values['reseller-external_id'] == '-'
+    assert values['created-at'] == '2024-01-10T10:00:00+00:00'
+    assert values['customer-name'] == 'Customer'
+    assert json.loads(values['contact']) == {'first_name': 'Jane'}
+    assert values['missing'] == '-'
+
+
+def test_get_value_from_split_header():
+    assert utils.get_value_from_split_header(ASSET, 'marketplace-name') == 'Marketplace'
+    assert utils.get_value_from_split_header(ASSET, 'status-id') == '-'
+    assert utils.get_asset_fields(
+        ['created-at', 'reseller-id', 'contact', 'id'],
+    ) == {'events', 'tiers', 'id'}
+
+
+def test_convert_to_datetime_parses_connect_timestamps():
+    expected = datetime(2024, 1, 31, 10, 20, 30)
+
+    assert utils.convert_to_datetime('2024-01-31T10:20:30+00:00') == expected
+    assert utils.convert_to_datetime('2024-01-31T10:20:30Z') == expected
+    assert utils.convert_to_datetime('2024-01-31 10:20:30') == expected
+    assert utils.convert_to_datetime('2024-01-31T10:20:30.123456+00:00') == expected
+    assert utils.convert_to_datetime('2024-01-31T12:20:30+02:00') == expected
+    assert utils.convert_to_datetime('-') == '-'
+    assert utils.convert_to_datetime(None) == '-'
+
+
+def test_run_context_freezes_the_clock():
+    context = RunContext(datetime(2024, 3, 1, 23, 30, tzinfo=timezone.utc))
+
+    assert context.today == date(2024, 3, 1)
+    assert context.exported_at == context.now.astimezone().strftime('%Y-%m-%d %H:%M:%S')
+    assert context.renewal_date('2020-02-29T10:00:00+00:00') == date(2025, 3, 1)
+    assert context.renewal_date('2020-02-29T23:59:59+00:00') == date(2025, 3, 1)
+    assert context.renewal_date('2023-03-01T00:00:00+00:00') == utils.calculate_renewal_date(
+        '2023-03-01T00:00:00+00:00', date(2024, 3, 1),
+    )
+    assert len(context._renewal_dates) == 2